@@ -0,0 +1,194 @@
+import time
+from abc import ABC, abstractmethod
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.core.cache import cache, caches
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK
+
+from api.utils import get_reference_objects
+from recipes.cache import CATALOG_VERSION_KEY, get_version, remember_versions
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_LOCK_TIMEOUT = 10
+RESPONSE_WAIT_TIMEOUT = 0.5
+RESPONSE_WAIT_INTERVAL = 0.05
+LOCKS_CACHE = 'locks'
+
+
+def normalized_address(request):
+    """Хеш адреса запроса с отсортированными параметрами."""
+
+    query = urlencode(sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    ))
+    return md5(
+        f'{request.get_host()}{request.path}?{query}'.encode()
+    ).hexdigest()
+
+
+def response_cache_key(request):
+    """Ключ кеша: версия каталога, адрес и нормализованные параметры."""
+
+    version = get_version(CATALOG_VERSION_KEY)
+    return f'response:{version}:{normalized_address(request)}'
+
+
+def stale_response_cache_key(request):
+    """Ключ последнего ответа по адресу при любой версии каталога."""
+
+    return f'response:stale:{normalized_address(request)}'
+
+
+class RememberVersionsMiddleware:
+    """Читает каждую версию данных не больше одного раза за запрос."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with remember_versions():
+            return self.get_response(request)
+
+
+class AnonymousCacheMixin:
+    """Кеширует список и детальную страницу для анонимных пользователей.
+
+    Ключ содержит версию каталога, поэтому любое изменение рецептов
+    сразу делает недействительными все сохраненные ответы. Ответ
+    строит запрос, взявший блокировку атомарным add, остальные
+    получают последний ответ по тому же адресу. Если его нет, они
+    ждут новый ответ не дольше RESPONSE_WAIT_TIMEOUT и строят его сами.
+    """
+
+    def get_cached_response(self, view, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        lock_key = f'{key}:lock'
+        locks = caches[LOCKS_CACHE]
+        stale_key = stale_response_cache_key(request)
+        if not locks.add(lock_key, True, RESPONSE_LOCK_TIMEOUT):
+            data = cache.get(stale_key)
+            if data is None:
+                data = self.wait_for_response(key)
+            if data is not None:
+                return Response(data)
+            return view(request, *args, **kwargs)
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code == HTTP_200_OK:
+                cache.set_many({
+                    key: response.data, stale_key: response.data
+                }, RESPONSE_CACHE_TIMEOUT)
+            return response
+        finally:
+            locks.delete(lock_key)
+
+    def wait_for_response(self, key):
+        """Ждет ответ, который строит другой запрос, или возвращает None."""
+
+        deadline = time.monotonic() + RESPONSE_WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(RESPONSE_WAIT_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin(ABC):
+    """Поддержка ETag и Last-Modified для списка и детальной страницы.
+
+    Метки строятся по моментам изменения данных, от которых зависит
+    ответ, поэтому 304 Not Modified возвращается до сериализации.
+    Представление обязано определить get_change_timestamps.
+    """
+
+    @abstractmethod
+    def get_change_timestamps(self, request, *args, **kwargs):
+        """Моменты изменения данных ответа в секундах.
+
+        Список должен меняться при любом изменении данных, от которых
+        зависит ответ. None или пустой список отключают метки, например
+        для несуществующего объекта.
+        """
+
+    def get_conditional_response(self, view, request, *args, **kwargs):
+        timestamps = self.get_change_timestamps(request, *args, **kwargs)
+        if not timestamps:
+            return view(request, *args, **kwargs)
+        etag = quote_etag(md5(
+            f'{request.user.pk}:{timestamps}:{normalized_address(request)}'
+            .encode()
+        ).hexdigest())
+        last_modified = int(max(timestamps))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != HTTP_200_OK:
+                return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ReferenceCacheMixin:
+    """Чтение справочника из копии в памяти процесса вместо базы."""
+
+    reference_cache = None
+
+    def get_queryset(self):
+        if self.request.method in SAFE_METHODS:
+            return list(get_reference_objects(
+                self.request, self.reference_cache
+            ).values())
+        return super().get_queryset()
+
+    def get_object(self):
+        if self.request.method not in SAFE_METHODS:
+            return super().get_object()
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            obj = get_reference_objects(
+                self.request, self.reference_cache
+            ).get(int(lookup))
+        except ValueError:
+            obj = None
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
@@ -1,34 +1,77 @@
-from django_filters.rest_framework import (FilterSet,
-                                           ModelMultipleChoiceFilter,
-                                           NumberFilter)
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, OuterRef
+from django_filters.rest_framework import (CharFilter, FilterSet,
+                                           MultipleChoiceFilter, NumberFilter)
 
-from recipes.models import Recipe, Tag
+from api.utils import get_reference_objects
+from recipes.cache import tags_cache
+from recipes.models import Recipe, TagsRecipe
+
+SEARCH_CONFIG = 'russian'
+SEARCH_PARAM = 'search'
 
 
 class RecipeFilter(FilterSet):
     """Фильтр рецептов."""
 
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
-    )
+    tags = MultipleChoiceFilter(method='tags_filter')
     author = NumberFilter(field_name='author__id')
     is_favorited = NumberFilter(method='is_favorited_filter')
     is_in_shopping_cart = NumberFilter(
         method='is_in_shopping_cart_filter'
     )
+    search = CharFilter(method='search_filter')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_in_shopping_cart', 'is_favorited')
+        fields = (
+            'tags', 'author', 'is_in_shopping_cart', 'is_favorited', 'search'
+        )
+
+    def __init__(self, *args, **kwargs):
+        """Варианты тегов из копии справочника, прочитанной для запроса."""
+
+        super().__init__(*args, **kwargs)
+        self.tag_objects = list(
+            get_reference_objects(self.request, tags_cache).values()
+        )
+        self.filters['tags'].extra['choices'] = [
+            (tag.slug, tag.name) for tag in self.tag_objects
+        ]
 
     def is_favorited_filter(self, queryset, name, value):
         if not value:
             return queryset
-        return queryset.filter(favorites__user=self.request.user)
+        if not self.request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(is_favorited=True)
 
     def is_in_shopping_cart_filter(self, queryset, name, value):
         if not value:
             return queryset
-        return queryset.filter(shop_cart__user=self.request.user)
+        if not self.request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(is_in_shopping_cart=True)
+
+    def tags_filter(self, queryset, name, value):
+        """Рецепты с любым из тегов, без JOIN и повторяющихся строк."""
+
+        if not value:
+            return queryset
+        slugs = set(value)
+        tag_ids = [tag.pk for tag in self.tag_objects if tag.slug in slugs]
+        return queryset.filter(Exists(TagsRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag__in=tag_ids
+        )))
+
+    def search_filter(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию с ранжированием."""
+
+        if not value.strip():
+            return queryset
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
@@ -0,0 +1,33 @@
+from rest_framework.renderers import BaseRenderer
+
+ERROR_CHARSET = 'utf-8'
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Рендерер списка покупок в формате TXT."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Рендеринг ответов с ошибками, сам список отдается потоком."""
+
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset or ERROR_CHARSET)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """Рендерер списка покупок в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(PlainTextRenderer):
+    """Рендерер списка покупок в формате PDF."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
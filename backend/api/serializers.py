@@ -1,18 +1,35 @@
+import re
+from base64 import b64decode
+from binascii import Error as BinasciiError
+from io import BytesIO
+
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, UnidentifiedImageError
 from rest_framework.serializers import (CharField, IntegerField,
                                         ModelSerializer,
                                         PrimaryKeyRelatedField, ReadOnlyField,
                                         SerializerMethodField, ValidationError)
 from rest_framework.validators import UniqueTogetherValidator
 
-from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from api.utils import get_reference_object, get_subscribed_authors
+from jobs.queue import enqueue
+from recipes.cache import ingredients_cache, tags_cache
+from recipes.images import SOURCE, get_placeholder_image
+from recipes.models import (Ingredient, IngredientRecipe, Recipe,
+                            ShoppingListItem, Tag)
+from recipes.tasks import STORE_IMAGE_JOB
 from users.models import Subscription
 
 User = get_user_model()
 MIN_VALUE = 1
 MAX_VALUE = 32_000
+IMAGE_DATA_RE = re.compile(
+    r'^(data:image/(jpeg|jpg|png|gif);base64,)?[A-Za-z0-9+/=\s]+$'
+)
 
 
 class UserRegistrationSerializer(UserCreateSerializer):
@@ -49,16 +66,83 @@ class UserSerializer(ModelSerializer):
     def get_is_subscribed(self, obj):
         """Получение информации о подписке."""
 
-        user = self.context.get('request').user
-        if not user.is_authenticated:
-            return False
-        return user.follower.filter(author=obj.id).exists()
+        return obj.id in get_subscribed_authors(self.context)
+
+
+class CachedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """Поле первичного ключа, проверяемое по кешу справочника."""
+
+    def __init__(self, reference_cache, **kwargs):
+        self.reference_cache = reference_cache
+        kwargs.setdefault('queryset', reference_cache.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            obj = get_reference_object(
+                self.context, self.reference_cache, int(data)
+            )
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class ImageVariantsField(ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки рецепта."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        return {
+            name: {
+                extension: request.build_absolute_uri(
+                    default_storage.url(path)
+                ) for extension, path in formats.items()
+            } for name, formats in value.items() if name != SOURCE
+        }
+
+
+class Base64ImageDataField(CharField):
+    """Картинка в base64, которая сохраняется в фоне.
+
+    Base64 и заголовок картинки проверяются сразу, чтобы ошибка
+    вернулась клиенту с ответом 400, а не в фоновой задаче.
+    """
+
+    default_error_messages = {
+        'invalid_image': 'Загрузите корректное изображение в base64.'
+    }
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('write_only', True)
+        kwargs.setdefault('trim_whitespace', False)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        match = IMAGE_DATA_RE.match(data)
+        if not match:
+            self.fail('invalid_image')
+        try:
+            with Image.open(BytesIO(
+                b64decode(data[len(match.group(1) or ''):])
+            )) as image:
+                image_format = (image.format or '').lower()
+        except (BinasciiError, UnidentifiedImageError,
+                Image.DecompressionBombError):
+            self.fail('invalid_image')
+        if image_format not in Base64ImageField.ALLOWED_TYPES:
+            self.fail('invalid_image')
+        return data
 
 
 class TagSerializer(ModelSerializer):
     """Сериализатор тегов."""
 
-    id = PrimaryKeyRelatedField(queryset=Tag.objects.all())
+    id = CachedPrimaryKeyRelatedField(tags_cache)
 
     class Meta:
         model = Tag
@@ -76,7 +160,7 @@ class IngredientSerializer(ModelSerializer):
 class IngredientRecipeCreateSerializer(ModelSerializer):
     """Сериализатор для создания ингредиентов рецепта."""
 
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = CachedPrimaryKeyRelatedField(ingredients_cache)
     amount = IntegerField(
         write_only=True, min_value=MIN_VALUE, max_value=MAX_VALUE
     )
@@ -93,8 +177,8 @@ class CreateRecipeSerializer(ModelSerializer):
         many=True, source='ingredient'
     )
     author = UserSerializer(read_only=True)
-    tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField(required=True)
+    tags = CachedPrimaryKeyRelatedField(tags_cache, many=True)
+    image = Base64ImageDataField(required=True)
     text = CharField(source='description')
     cooking_time = IntegerField(
         write_only=True, min_value=MIN_VALUE, max_value=MAX_VALUE
@@ -117,6 +201,16 @@ class CreateRecipeSerializer(ModelSerializer):
             )
         return data
 
+    def validate_ingredients(self, ingredients):
+        """Проверка, что ингредиенты в рецепте не повторяются."""
+
+        ids = [ingredient['id'].pk for ingredient in ingredients]
+        if len(ids) != len(set(ids)):
+            raise ValidationError(
+                'Ингредиенты в рецепте не должны повторяться!'
+            )
+        return ingredients
+
     def ingredient_recipe_bulk_create(self, ingredients, recipe):
         """Создание ингредиентов рецепта."""
 
@@ -130,36 +224,110 @@ class CreateRecipeSerializer(ModelSerializer):
             ]
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта."""
 
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredient')
+        image = validated_data.pop('image')
         recipe = Recipe.objects.create(
             author=self.context.get('request').user,
+            image=get_placeholder_image(),
             **validated_data
         )
-        recipe.save()
         self.ingredient_recipe_bulk_create(ingredients, recipe)
         recipe.tags.set(tags)
+        enqueue(STORE_IMAGE_JOB, {'recipe_id': recipe.pk, 'image': image})
         return recipe
 
+    def update_ingredients(self, instance, ingredients):
+        """Применяет к рецепту только изменения состава ингредиентов.
+
+        Возвращает id ингредиентов, которые были добавлены, удалены
+        или у которых изменилось количество.
+        """
+
+        amounts = {
+            ingredient.get('id').pk: ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        current = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in instance.recipe.all()
+        }
+        removed = current.keys() - amounts.keys()
+        added = amounts.keys() - current.keys()
+        changed = [
+            ingredient_recipe for ingredient_id, ingredient_recipe
+            in current.items() if ingredient_id in amounts
+            and ingredient_recipe.amount != amounts[ingredient_id]
+        ]
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=instance, ingredient_id__in=removed
+            ).delete()
+        for ingredient_recipe in changed:
+            ingredient_recipe.amount = amounts[ingredient_recipe.ingredient_id]
+        IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=instance,
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id]
+            ) for ingredient_id in added
+        )
+        return removed | added | {
+            ingredient_recipe.ingredient_id for ingredient_recipe in changed
+        }
+
+    def update_tags(self, instance, tags):
+        """Применяет к рецепту только изменения тегов."""
+
+        new = {tag.pk for tag in tags}
+        current = {
+            tag_recipe.tag_id for tag_recipe in instance.tagsrecipe_set.all()
+        }
+        if current - new:
+            instance.tags.remove(*(current - new))
+        if new - current:
+            instance.tags.add(*(new - current))
+        return current != new
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление рецепта."""
+        """Обновление рецепта.
+
+        Записываются только изменившиеся поля и связи; картинка,
+        если она передана, сохраняется в фоне.
+        """
 
         tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredient')
-        instance = super().update(instance, validated_data)
-        instance.tags.clear()
-        instance.ingredient.clear()
-        instance.name = validated_data.get('name')
-        instance.text = validated_data.get('text')
-        instance.cooking_time = validated_data.get('cooking_time')
-        if validated_data.get('image') is not None:
-            instance.image = validated_data.pop('image')
-        instance.save()
-        self.ingredient_recipe_bulk_create(ingredients, instance)
-        instance.tags.set(tags)
+        ingredients = validated_data.pop('ingredient', None)
+        image = validated_data.pop('image', None)
+        update_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        changed_ingredients = set()
+        if ingredients is not None:
+            changed_ingredients = self.update_ingredients(
+                instance, ingredients
+            )
+        tags_changed = self.update_tags(instance, tags)
+        if update_fields or changed_ingredients or tags_changed:
+            instance.save(update_fields=update_fields + ['updated_at'])
+        if changed_ingredients:
+            ShoppingListItem.objects.refresh(
+                User.objects.filter(shop_cart__recipe=instance),
+                changed_ingredients
+            )
+        if image is not None:
+            enqueue(
+                STORE_IMAGE_JOB, {'recipe_id': instance.pk, 'image': image}
+            )
         return instance
 
     def to_representation(self, instance):
@@ -169,34 +337,69 @@ class CreateRecipeSerializer(ModelSerializer):
 class ReadIngredientRecipeSerializer(ModelSerializer):
     """Сериализатор для чтения ингредиентов рецепта."""
 
-    id = ReadOnlyField(source='ingredient.id')
-    name = ReadOnlyField(source='ingredient.name')
-    measurement_unit = ReadOnlyField(source='ingredient.measurement_unit')
+    id = ReadOnlyField(source='ingredient_id')
+    name = SerializerMethodField(read_only=True)
+    measurement_unit = SerializerMethodField(read_only=True)
 
     class Meta:
         model = IngredientRecipe
         fields = ('id', 'name', 'measurement_unit', 'amount')
         read_only_fields = ('amount',)
 
+    def get_ingredient(self, obj):
+        return get_reference_object(
+            self.context, ingredients_cache, obj.ingredient_id
+        )
+
+    def get_name(self, obj):
+        return self.get_ingredient(obj).name
+
+    def get_measurement_unit(self, obj):
+        return self.get_ingredient(obj).measurement_unit
+
 
 class ReadRecipeSerializer(ModelSerializer):
     """Сериализатор для чтения рецепта."""
 
     author = UserSerializer(read_only=True)
-    ingredients = ReadIngredientRecipeSerializer(
-        many=True, read_only=True, source='recipe'
-    )
-    tags = TagSerializer(many=True, read_only=True)
+    ingredients = SerializerMethodField(read_only=True)
+    tags = SerializerMethodField(read_only=True)
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
     text = CharField(source='description')
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time'
+        )
+
+    def get_tags(self, obj):
+        """Получение тегов рецепта из кеша справочников."""
+
+        tags = sorted(
+            (get_reference_object(self.context, tags_cache, tag_recipe.tag_id)
+             for tag_recipe in obj.tagsrecipe_set.all()),
+            key=lambda tag: tag.name
         )
+        return TagSerializer(tags, many=True, context=self.context).data
+
+    def get_ingredients(self, obj):
+        """Получение ингредиентов рецепта из кеша справочников."""
+
+        ingredients = sorted(
+            obj.recipe.all(),
+            key=lambda ingredient_recipe: get_reference_object(
+                self.context, ingredients_cache,
+                ingredient_recipe.ingredient_id
+            ).name
+        )
+        return ReadIngredientRecipeSerializer(
+            ingredients, many=True, context=self.context
+        ).data
 
     def get_is_favorited(self, obj):
         """Получение информации о добавлении рецепта в избранное."""
@@ -204,6 +407,8 @@ class ReadRecipeSerializer(ModelSerializer):
         user = self.context.get('request').user
         if not user.is_authenticated:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
@@ -212,15 +417,19 @@ class ReadRecipeSerializer(ModelSerializer):
         user = self.context.get('request').user
         if not user.is_authenticated:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return user.shop_cart.filter(recipe=obj).exists()
 
 
 class FavoriteRecipeSerializer(ModelSerializer):
     """Сериализатор для добавления рецепта в избранное."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class SubscribeSerializer(ModelSerializer):
@@ -231,9 +440,9 @@ class SubscribeSerializer(ModelSerializer):
     last_name = CharField(source='author.last_name', read_only=True)
     email = CharField(source='author.email', read_only=True)
     recipes = FavoriteRecipeSerializer(
-        many=True, source='author.recipes', read_only=True
+        many=True, source='author.limited_recipes', read_only=True
     )
-    recipes_count = IntegerField(read_only=True)
+    recipes_count = IntegerField(source='author.recipes_count', read_only=True)
 
     class Meta:
         model = User
@@ -0,0 +1,604 @@
+import json
+import random
+import time
+from base64 import b64encode
+from collections import Counter
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core.cache import caches
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.cache import RESPONSE_WAIT_INTERVAL, RESPONSE_WAIT_TIMEOUT
+from recipes.benchmark import ApiBenchmark, compare
+from recipes.cache import (CATALOG_VERSION_KEY, ReferenceCache, bump_version,
+                           get_version)
+from recipes.images import PLACEHOLDER_IMAGE
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, ShoppingListItem, Tag,
+                            TagsRecipe)
+from recipes.query_plans import (get_query_plans, missing_index,
+                                 seed_plan_endpoints, seq_scans)
+from users.models import Subscription, User
+
+TEST_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': alias,
+    } for alias in ('default', 'versions', 'local_versions', 'locks')
+}
+DATABASE_VERSIONS_CACHES = {
+    **TEST_CACHES, 'versions': settings.CACHES['versions']
+}
+RECIPES = 12
+RECIPE_LIST_QUERIES = 5
+RECIPE_CHANGELIST_URL = '/admin/recipes/recipe/'
+BENCHMARK_BASELINE = settings.BASE_DIR.parent / 'data' / 'benchmark_api.json'
+BENCHMARK_SCALE = 1_000
+PLAN_RECIPES = 200
+PLAN_AUTHORS = 3
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CatalogTestCase(TestCase):
+    """Каталог из нескольких рецептов с тегами и ингредиентами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='cook@example.com', username='cook', password='password',
+            first_name='Повар', last_name='Поваров'
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag-{number}')
+            for number in range(3)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.user, name=f'Рецепт {number}',
+                description='Описание', cooking_time=10,
+                image=PLACEHOLDER_IMAGE
+            ) for number in range(RECIPES)
+        )
+        TagsRecipe.objects.bulk_create(
+            TagsRecipe(recipe=recipe, tag=tag)
+            for number, recipe in enumerate(cls.recipes)
+            for tag in cls.tags[:number % len(cls.tags) + 1]
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in cls.recipes for ingredient in cls.ingredients[:3]
+        )
+        FavoriteRecipe.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_results(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+
+class RecipeListQueriesTest(CatalogTestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.get_results('/api/recipes/')
+        for limit in (2, RECIPES):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(RECIPE_LIST_QUERIES):
+                    results = self.get_results(f'/api/recipes/?limit={limit}')
+                self.assertEqual(len(results), limit)
+
+    def test_reference_cache_reads_do_not_depend_on_page_size(self):
+        reads = []
+        for limit in (2, RECIPES):
+            with mock.patch(
+                'recipes.cache.get_version', wraps=get_version
+            ) as version:
+                self.get_results(f'/api/recipes/?limit={limit}')
+            reads.append(version.call_count)
+        self.assertEqual(reads[0], reads[1])
+
+    def test_flags_of_current_user(self):
+        results = {
+            recipe['id']: recipe
+            for recipe in self.get_results(f'/api/recipes/?limit={RECIPES}')
+        }
+        self.assertTrue(results[self.recipes[0].pk]['is_favorited'])
+        self.assertFalse(results[self.recipes[0].pk]['is_in_shopping_cart'])
+        self.assertTrue(results[self.recipes[1].pk]['is_in_shopping_cart'])
+
+
+class ReferenceReadsTest(CatalogTestCase):
+    """Справочники отдаются из памяти, версии читаются раз за запрос."""
+
+    def get_copy_reads(self, url):
+        with mock.patch.object(
+            ReferenceCache, 'get_objects', autospec=True,
+            side_effect=ReferenceCache.get_objects
+        ) as get_objects:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return Counter(
+            call.args[0].version_key for call in get_objects.call_args_list
+        )
+
+    def test_warm_reference_endpoints_do_not_query(self):
+        for url in (
+            '/api/tags/', f'/api/tags/{self.tags[0].pk}/',
+            '/api/ingredients/', f'/api/ingredients/{self.ingredients[0].pk}/'
+        ):
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_copies_are_read_once_per_request(self):
+        for url in (
+            '/api/tags/', '/api/ingredients/', '/api/ingredients/?name=Инг',
+            f'/api/recipes/?tags={self.tags[0].slug}',
+            f'/api/recipes/{self.recipes[0].pk}/'
+        ):
+            with self.subTest(url=url):
+                reads = self.get_copy_reads(url)
+                self.assertEqual(set(reads.values()), {1})
+
+
+class RecipeTagsFilterTest(CatalogTestCase):
+    """Фильтр по нескольким тегам."""
+
+    def get_url(self, tags):
+        query = '&'.join(f'tags={tag.slug}' for tag in tags)
+        return f'/api/recipes/?limit={RECIPES}&{query}'
+
+    def test_no_duplicates(self):
+        response = self.client.get(self.get_url(self.tags))
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), RECIPES)
+        self.assertEqual(response.data['count'], RECIPES)
+        self.assertEqual(
+            len(self.get_results(self.get_url(self.tags[2:]))),
+            RECIPES // len(self.tags)
+        )
+
+    def test_query_count_does_not_depend_on_tags(self):
+        self.get_results(self.get_url(self.tags[:1]))
+        for number in range(1, len(self.tags) + 1):
+            with self.subTest(tags=number):
+                with self.assertNumQueries(RECIPE_LIST_QUERIES):
+                    self.get_results(self.get_url(self.tags[:number]))
+
+    def test_unknown_tag(self):
+        response = self.client.get('/api/recipes/?tags=unknown')
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeSearchTest(CatalogTestCase):
+    """Поиск сортирует по релевантности при любой пагинации."""
+
+    def test_cursor_pagination_keeps_rank_order(self):
+        relevant, newer = self.recipes[:2]
+        Recipe.objects.filter(pk=relevant.pk).update(
+            name='Борщ', description='Борщ со сметаной'
+        )
+        Recipe.objects.filter(pk=newer.pk).update(
+            name='Суп', description='Почти борщ'
+        )
+        for query in ('', '&pagination=cursor'):
+            with self.subTest(query=query):
+                results = self.get_results(f'/api/recipes/?search=борщ{query}')
+                self.assertEqual(
+                    [recipe['id'] for recipe in results],
+                    [relevant.pk, newer.pk]
+                )
+
+
+class RecipeCursorPaginationTest(CatalogTestCase):
+    """Курсор сравнивает пару (pub_date, id) без OFFSET."""
+
+    def test_equal_pub_dates(self):
+        Recipe.objects.update(pub_date=self.recipes[0].pub_date)
+        url = '/api/recipes/?pagination=cursor&limit=5'
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([
+                query for query in queries.captured_queries
+                if 'OFFSET' in query['sql']
+            ])
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+            if len(ids) == 5:
+                Recipe.objects.create(
+                    author=self.user, name='Новый рецепт',
+                    description='Описание', cooking_time=10,
+                    image=PLACEHOLDER_IMAGE, pub_date=self.recipes[0].pub_date
+                )
+        self.assertEqual(
+            ids, sorted((recipe.pk for recipe in self.recipes), reverse=True)
+        )
+
+
+class RecipeChangelistQueriesTest(CatalogTestCase):
+    """Число запросов списка рецептов в админке не зависит от их числа."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='password'
+        ))
+
+    def get_changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPE_CHANGELIST_URL)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_recipes(self):
+        self.client.get(RECIPE_CHANGELIST_URL)
+        expected = self.get_changelist_queries()
+        authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}', password='password'
+            ) for number in range(RECIPES)
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author, name=f'Рецепт автора {author.username}',
+                description='Описание', cooking_time=10,
+                image=PLACEHOLDER_IMAGE
+            ) for author in authors
+        )
+        self.assertEqual(self.get_changelist_queries(), expected)
+
+
+class SubscriptionsTest(CatalogTestCase):
+    """Подписки с ограничением числа рецептов."""
+
+    def test_user_without_subscriptions(self):
+        response = self.client.get('/api/users/subscriptions/?recipes_limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_recipes_limit(self):
+        follower = User.objects.create_user(
+            email='follower@example.com', username='follower',
+            password='password', first_name='Подписчик', last_name='Первый'
+        )
+        Subscription.objects.create(user=follower, author=self.user)
+        self.client.force_authenticate(follower)
+        results = self.get_results('/api/users/subscriptions/?recipes_limit=3')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(results[0]['recipes']), 3)
+
+
+class ShoppingListDownloadTest(CatalogTestCase):
+    """Скачивание списка покупок в каждом формате."""
+
+    def download(self, file_format):
+        response = self.client.get(
+            f'/api/recipes/download_shopping_cart/?format={file_format}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_text_formats(self):
+        for file_format in ('txt', 'csv'):
+            with self.subTest(format=file_format):
+                response, content = self.download(file_format)
+                self.assertIn('charset=utf-8', response['Content-Type'])
+                self.assertIn(
+                    self.ingredients[0].name, content.decode('utf-8')
+                )
+
+    def test_pdf(self):
+        response, content = self.download('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('wishlist.pdf', response['Content-Disposition'])
+        self.assertTrue(content.startswith(b'%PDF'))
+
+
+class ShoppingListTest(CatalogTestCase):
+    """Сводный список покупок следует за корзиной и составом рецептов."""
+
+    def get_totals(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user
+        ).values_list('ingredient_id', 'total_amount'))
+
+    def test_cart_changes(self):
+        self.assertEqual(self.get_totals(), {
+            ingredient.pk: 1 for ingredient in self.ingredients[:3]
+        })
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipes[2])
+        self.assertEqual(self.get_totals(), {
+            ingredient.pk: 2 for ingredient in self.ingredients[:3]
+        })
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.get_totals(), {})
+
+    def test_recipe_changes(self):
+        ingredient_recipe = IngredientRecipe.objects.get(
+            recipe=self.recipes[1], ingredient=self.ingredients[0]
+        )
+        ingredient_recipe.ingredient = self.ingredients[3]
+        ingredient_recipe.amount = 5
+        ingredient_recipe.save()
+        self.assertEqual(self.get_totals(), {
+            self.ingredients[1].pk: 1,
+            self.ingredients[2].pk: 1,
+            self.ingredients[3].pk: 5,
+        })
+        self.recipes[1].delete()
+        self.assertEqual(self.get_totals(), {})
+
+
+class UserChangesTest(CatalogTestCase):
+    """Кеш ответов сбрасывается только после изменения публичных полей."""
+
+    def test_login_keeps_cache(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            update_last_login(None, self.user)
+            self.user.set_password('new-password')
+            self.user.save()
+        self.assertEqual(callbacks, [])
+
+    def test_public_fields_reset_cache(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.first_name = 'Шеф'
+            self.user.save()
+        self.assertTrue(callbacks)
+
+
+class CacheAliasesTest(CatalogTestCase):
+    """Версии кеша не вытесняются вместе с ответами."""
+
+    def test_versions_survive_response_cache_clear(self):
+        version = get_version(CATALOG_VERSION_KEY)
+        caches['default'].clear()
+        self.assertEqual(get_version(CATALOG_VERSION_KEY), version)
+
+
+class AnonymousCacheTest(CatalogTestCase):
+    """Пока ответ строит другой запрос, остальные не опрашивают блокировку."""
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def get_with_lock_taken(self, url):
+        with mock.patch.object(
+            caches['locks'], 'add', return_value=False
+        ) as add, mock.patch(
+            'api.cache.time.sleep', wraps=time.sleep
+        ) as sleep:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(add.call_count, 1)
+        return response, sleep.call_count
+
+    def test_stale_response_while_locked(self):
+        url = f'/api/recipes/?limit={RECIPES}'
+        self.client.get(url)
+        bump_version(CATALOG_VERSION_KEY)
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(name='Новое')
+        with self.assertNumQueries(0):
+            response, sleeps = self.get_with_lock_taken(url)
+        self.assertNotIn(
+            'Новое', [recipe['name'] for recipe in response.data['results']]
+        )
+        self.assertEqual(sleeps, 0)
+
+    def test_bounded_wait_without_stale_response(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        response, sleeps = self.get_with_lock_taken(url)
+        self.assertEqual(response.data['id'], self.recipes[0].pk)
+        self.assertLessEqual(
+            sleeps, RESPONSE_WAIT_TIMEOUT / RESPONSE_WAIT_INTERVAL + 1
+        )
+
+
+@override_settings(CACHES=DATABASE_VERSIONS_CACHES)
+class VersionReadsTest(CatalogTestCase):
+    """Версии из базы читаются повторно только после TIMEOUT копии."""
+
+    def get_version_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query for query in queries.captured_queries
+            if 'cache_versions' in query['sql']
+        ]
+
+    def test_warm_requests_do_not_read_versions(self):
+        for url in (
+            '/api/recipes/', f'/api/recipes/{self.recipes[0].pk}/',
+            '/api/tags/', '/api/ingredients/'
+        ):
+            with self.subTest(url=url):
+                self.get_version_queries(url)
+                self.assertEqual(self.get_version_queries(url), [])
+
+    def test_warm_prefix_lookup_does_not_query(self):
+        url = f'/api/ingredients/?name={self.ingredients[0].name[:3]}'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), len(self.ingredients))
+
+    @override_settings(CACHES={
+        **DATABASE_VERSIONS_CACHES,
+        'local_versions': {**TEST_CACHES['local_versions'], 'TIMEOUT': 0},
+    })
+    def test_request_reads_each_version_once(self):
+        for url in (
+            '/api/ingredients/', f'/api/recipes/{self.recipes[0].pk}/'
+        ):
+            with self.subTest(url=url):
+                self.client.get(url)
+                reads = Counter(
+                    query['sql'] for query in self.get_version_queries(url)
+                )
+                self.assertTrue(reads)
+                self.assertEqual(set(reads.values()), {1})
+
+    def test_bump_is_visible_in_process(self):
+        get_version(CATALOG_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].save()
+        self.assertEqual(
+            get_version(CATALOG_VERSION_KEY),
+            caches['versions'].get(CATALOG_VERSION_KEY)
+        )
+
+
+@override_settings(CACHES=DATABASE_VERSIONS_CACHES)
+class ApiBenchmarkTest(TestCase):
+    """Запросы к базе и размер ответов на синтетическом каталоге.
+
+    Сравниваются с data/benchmark_api.json, который обновляет команда
+    benchmark_api --update-baseline.
+    """
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_not_worse_than_baseline(self):
+        baseline = json.loads(BENCHMARK_BASELINE.read_text())
+        benchmark = ApiBenchmark(random.Random(0))
+        benchmark.seed(BENCHMARK_SCALE)
+        results = {str(BENCHMARK_SCALE): benchmark.measure_all(requests=0)}
+        self.assertEqual(
+            results[str(BENCHMARK_SCALE)].keys(),
+            baseline[str(BENCHMARK_SCALE)].keys()
+        )
+        self.assertEqual(compare(results, baseline), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryPlansTest(TestCase):
+    """Планы основных запросов API используют свои индексы."""
+
+    def test_plans_use_indexes(self):
+        for cache in caches.all():
+            cache.clear()
+        plans = get_query_plans(
+            seed_plan_endpoints(PLAN_RECIPES, PLAN_AUTHORS, random.Random(0))
+        )
+        for name, queries in plans.items():
+            with self.subTest(endpoint=name):
+                self.assertTrue(queries)
+                self.assertEqual(seq_scans(queries), [])
+                self.assertIsNone(missing_index(name, queries))
+
+
+class RecipeLinksChangesTest(CatalogTestCase):
+    """Правка тегов и ингредиентов меняет метку рецепта."""
+
+    def get_etag(self):
+        response = self.client.get(f'/api/recipes/{self.recipes[0].pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_link_changes_reset_etag(self):
+        ingredient_recipe = IngredientRecipe.objects.filter(
+            recipe=self.recipes[0]
+        ).first()
+        changes = {
+            'save': lambda: ingredient_recipe.save(),
+            'delete': lambda: TagsRecipe.objects.filter(
+                recipe=self.recipes[0]
+            ).delete(),
+            'add': lambda: self.recipes[0].tags.add(self.tags[1]),
+            'remove': lambda: self.recipes[0].tags.remove(self.tags[1]),
+        }
+        for name, change in changes.items():
+            with self.subTest(change=name):
+                Recipe.objects.filter(pk=self.recipes[0].pk).update(
+                    updated_at=self.recipes[0].pub_date
+                )
+                etag = self.get_etag()
+                change()
+                self.assertNotEqual(self.get_etag(), etag)
+
+
+class RecipeCreateTest(CatalogTestCase):
+    """Создание рецепта через API."""
+
+    def setUp(self):
+        super().setUp()
+        buffer = BytesIO()
+        Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+        self.image = (
+            f'data:image/png;base64,{b64encode(buffer.getvalue()).decode()}'
+        )
+
+    def create(self, **data):
+        return self.client.post('/api/recipes/', {
+            'tags': [self.tags[0].pk],
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 10}],
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': self.image,
+            **data
+        }, format='json')
+
+    def test_create(self):
+        self.assertEqual(self.create().status_code, 201)
+
+    def test_create_saves_recipe_once(self):
+        receiver = mock.Mock()
+        post_save.connect(receiver, sender=Recipe)
+        try:
+            self.assertEqual(self.create().status_code, 201)
+        finally:
+            post_save.disconnect(receiver, sender=Recipe)
+        self.assertEqual(receiver.call_count, 1)
+
+    def test_repeated_ingredients(self):
+        ingredient = {'id': self.ingredients[0].pk, 'amount': 10}
+        response = self.create(ingredients=[ingredient, ingredient])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.data)
+        response = self.client.patch(
+            f'/api/recipes/{self.recipes[0].pk}/', {
+                'tags': [self.tags[0].pk],
+                'ingredients': [ingredient, ingredient],
+            }, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_undecodable_image(self):
+        for image in ('data:image/png;base64,AAAA', 'data:image/png;base64,A'):
+            with self.subTest(image=image):
+                response = self.create(image=image)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('image', response.data)
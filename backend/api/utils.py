@@ -1,5 +1,343 @@
-from rest_framework.pagination import PageNumberPagination
+import csv
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+from django.db.models import F, Prefetch, Window, prefetch_related_objects
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.models import Recipe
+from recipes.timeline import before
+
+SUBSCRIBED_AUTHORS = 'subscribed_authors'
+REFERENCE_OBJECTS = 'reference_objects'
+RECIPES_LIMIT_PARAM = 'recipes_limit'
+SHOPPING_LIST_TITLE = 'Список покупок'
+SHOPPING_LIST_CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+SHOPPING_LIST_CHUNK_SIZE = 500
+SHOPPING_LIST_PDF_FONT = 'DejaVuSans'
+SHOPPING_LIST_PDF_FONT_FILE = (
+    Path(__file__).resolve().parent / 'fonts' / 'DejaVuSans.ttf'
+)
+SHOPPING_LIST_PDF_TITLE_SIZE = 16
+SHOPPING_LIST_PDF_FONT_SIZE = 12
+SHOPPING_LIST_PDF_LINE_HEIGHT = 18
+SHOPPING_LIST_PDF_MARGIN = 50
+PAGINATION_PARAM = 'pagination'
+CURSOR_PAGINATION = 'cursor'
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class TimelinePagination(BasePagination):
+    """Keyset-пагинация ленты подписок по (pub_date, id).
+
+    Курсор — позиция последнего рецепта страницы, следующая страница
+    начинается строго после нее, поэтому новые публикации не сдвигают
+    уже полученные страницы.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        if page_size <= 0:
+            return api_settings.PAGE_SIZE
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, recipe_id = b64decode(
+                encoded.encode(), validate=True
+            ).decode().split('|')
+            return datetime.fromisoformat(pub_date), int(recipe_id)
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        pub_date, recipe_id = position
+        return b64encode(
+            f'{pub_date.isoformat()}|{recipe_id}'.encode()
+        ).decode()
+
+    def get_position(self, item):
+        """Позиция (pub_date, id) элемента страницы."""
+
+        return item
+
+    def paginate_timeline(self, read_page, request):
+        """Возвращает позиции страницы, прочитанные через read_page."""
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        page = read_page(self.decode_cursor(request), page_size + 1)
+        self.next_position = (
+            self.get_position(page[page_size - 1])
+            if len(page) > page_size else None
+        )
+        return page[:page_size]
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+
+class RecipeCursorPagination(TimelinePagination):
+    """Keyset-пагинация рецептов по (pub_date, id).
+
+    Страница начинается строго после пары (pub_date, id) последнего
+    рецепта предыдущей, поэтому рецепты с одинаковой датой не требуют
+    OFFSET, а общее количество не считается.
+    """
+
+    def get_position(self, item):
+        return item.pub_date, item.pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        def read_page(position, size):
+            page = queryset.order_by('-pub_date', '-id')
+            if position is not None:
+                page = page.filter(before(position, 'pub_date', 'id'))
+            return list(page[:size])
+
+        return self.paginate_timeline(read_page, request)
+
+
+def uses_cursor_pagination(request):
+    """Проверяет, запросил ли клиент курсорную пагинацию."""
+
+    return (
+        request.query_params.get(PAGINATION_PARAM) == CURSOR_PAGINATION
+        or RecipeCursorPagination.cursor_query_param in request.query_params
+    )
+
+
+class SubscribedAuthors:
+    """Ленивое множество id авторов, на которых подписан пользователь.
+
+    Подписки загружаются одним запросом при первой проверке,
+    все последующие проверки выполняются без обращения к базе.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._author_ids = None
+
+    def __contains__(self, author_id):
+        if not self.user.is_authenticated:
+            return False
+        if self._author_ids is None:
+            self._author_ids = set(
+                self.user.follower.values_list('author_id', flat=True)
+            )
+        return author_id in self._author_ids
+
+
+def get_subscribed_authors(context):
+    """Возвращает подписки текущего пользователя из контекста."""
+
+    if SUBSCRIBED_AUTHORS not in context:
+        context[SUBSCRIBED_AUTHORS] = SubscribedAuthors(
+            context.get('request').user
+        )
+    return context[SUBSCRIBED_AUTHORS]
+
+
+def get_reference_objects(request, reference_cache):
+    """Возвращает словарь объектов справочника по первичному ключу.
+
+    Копия справочника берется из кеша один раз за запрос и хранится
+    в нем, поэтому фильтр, представление и сериализаторы читают
+    версию справочника только при первом обращении.
+    """
+
+    if request is None:
+        return reference_cache.get_objects()
+    references = getattr(request, REFERENCE_OBJECTS, None)
+    if references is None:
+        references = {}
+        setattr(request, REFERENCE_OBJECTS, references)
+    if reference_cache not in references:
+        references[reference_cache] = reference_cache.get_objects()
+    return references[reference_cache]
+
+
+def get_reference_object(context, reference_cache, pk):
+    """Возвращает объект справочника или None, если его нет в базе."""
+
+    objects = get_reference_objects(context.get('request'), reference_cache)
+    obj = objects.get(pk)
+    if obj is None:
+        obj = reference_cache.get(pk)
+    return obj
+
+
+class SubscribedAuthorsMixin:
+    """Добавляет в контекст сериализатора подписки пользователя."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[SUBSCRIBED_AUTHORS] = SubscribedAuthors(self.request.user)
+        return context
+
+
+def get_recipes_limit(request):
+    """Возвращает значение параметра recipes_limit или None."""
+
+    try:
+        limit = int(request.query_params.get(RECIPES_LIMIT_PARAM))
+    except (TypeError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def prefetch_author_recipes(subscriptions, limit=None):
+    """Подгружает рецепты авторов подписок одним запросом.
+
+    При заданном limit каждому автору достается не больше limit
+    последних рецептов: они отбираются в базе оконной функцией
+    ROW_NUMBER() по автору. Рецепты доступны в author.limited_recipes.
+    """
+
+    if not subscriptions:
+        return
+    recipes = Recipe.objects.only(
+        'id', 'author_id', 'name', 'image', 'image_variants', 'cooking_time'
+    ).order_by('-pub_date')
+    if limit is not None:
+        ranked = Recipe.objects.filter(
+            author__in={subscription.author_id
+                        for subscription in subscriptions}
+        ).annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=F('pub_date').desc()
+        )).order_by().values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        recipes = recipes.filter(id__in=RawSQL(
+            f'SELECT "id" FROM ({sql}) AS "ranked" '
+            f'WHERE "row_number" <= %s',
+            (*params, limit)
+        ))
+    prefetch_related_objects(
+        subscriptions,
+        Prefetch('author__recipes', queryset=recipes,
+                 to_attr='limited_recipes')
+    )
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list_txt(ingredients):
+    """Построчно формирует список покупок в формате TXT.
+
+    Заголовок отдается до выполнения запроса, поэтому клиент получает
+    первые байты, пока база еще агрегирует ингредиенты.
+    """
+
+    yield f'{SHOPPING_LIST_TITLE}\n\n'
+    for ingredient in ingredients.iterator(SHOPPING_LIST_CHUNK_SIZE):
+        yield (f'{ingredient["ingredient__name"]}: '
+               f'{ingredient["total_sum"]}'
+               f'{ingredient["ingredient__measurement_unit"]}.\n')
+
+
+def shopping_list_csv(ingredients):
+    """Построчно формирует список покупок в формате CSV."""
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_CSV_HEADER)
+    for ingredient in ingredients.iterator(SHOPPING_LIST_CHUNK_SIZE):
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['total_sum'],
+            ingredient['ingredient__measurement_unit']
+        ))
+
+
+def register_pdf_font():
+    """Регистрирует шрифт с кириллицей для PDF один раз за процесс."""
+
+    if SHOPPING_LIST_PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(SHOPPING_LIST_PDF_FONT, SHOPPING_LIST_PDF_FONT_FILE)
+        )
+
+
+def shopping_list_pdf(ingredients):
+    """Формирует список покупок в формате PDF.
+
+    Строки читаются из базы пачками, но документ отдается целиком после
+    отрисовки: таблица ссылок PDF пишется в конец файла.
+    """
+
+    register_pdf_font()
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    pdf.setTitle(SHOPPING_LIST_TITLE)
+    width, height = A4
+    top = height - SHOPPING_LIST_PDF_MARGIN
+    pdf.setFont(SHOPPING_LIST_PDF_FONT, SHOPPING_LIST_PDF_TITLE_SIZE)
+    pdf.drawString(SHOPPING_LIST_PDF_MARGIN, top, SHOPPING_LIST_TITLE)
+    pdf.setFont(SHOPPING_LIST_PDF_FONT, SHOPPING_LIST_PDF_FONT_SIZE)
+    position = top - 2 * SHOPPING_LIST_PDF_LINE_HEIGHT
+    for ingredient in ingredients.iterator(SHOPPING_LIST_CHUNK_SIZE):
+        if position < SHOPPING_LIST_PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(SHOPPING_LIST_PDF_FONT, SHOPPING_LIST_PDF_FONT_SIZE)
+            position = top
+        pdf.drawString(
+            SHOPPING_LIST_PDF_MARGIN, position,
+            f'{ingredient["ingredient__name"]}: {ingredient["total_sum"]}'
+            f'{ingredient["ingredient__measurement_unit"]}.'
+        )
+        position -= SHOPPING_LIST_PDF_LINE_HEIGHT
+    pdf.save()
+    yield buffer.getvalue()
+
+
+SHOPPING_LIST_WRITERS = {
+    'txt': shopping_list_txt,
+    'csv': shopping_list_csv,
+    'pdf': shopping_list_pdf,
+}
@@ -1,39 +1,114 @@
-from django.db.models import Count, Sum
-from django.http import HttpResponse
+import uuid
+from tempfile import TemporaryFile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Exists, F, OuterRef
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework.decorators import action
-from rest_framework.permissions import (IsAuthenticated,
+from rest_framework.permissions import (IsAdminUser, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
 from rest_framework.viewsets import ModelViewSet
 
-from api.filters import RecipeFilter
+from api.cache import (AnonymousCacheMixin, ConditionalGetMixin,
+                       ReferenceCacheMixin)
+from api.filters import SEARCH_PARAM, RecipeFilter
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from api.serializers import (CreateRecipeSerializer, FavoriteRecipeSerializer,
                              IngredientSerializer, ReadRecipeSerializer,
                              SubscribeSerializer, TagSerializer,
                              UserSerializer)
-from api.utils import CustomPagination
-from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
-                            Recipe, ShoppingCart, Tag, User)
+from api.utils import (SHOPPING_LIST_WRITERS, CustomPagination,
+                       RecipeCursorPagination, SubscribedAuthorsMixin,
+                       TimelinePagination, get_recipes_limit,
+                       get_reference_objects, prefetch_author_recipes,
+                       uses_cursor_pagination)
+from recipes.cache import (CATALOG_VERSION_KEY, INGREDIENTS_VERSION_KEY,
+                           REFERENCE_VERSION_KEY, USER_VERSION_KEY,
+                           get_version_timestamp, ingredients_cache,
+                           tags_cache)
+from recipes.importers import IMPORT_REPORTS_DIR, RecipeImporter, report_line
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag, User)
+from recipes.search import (MAX_MISSING_INGREDIENTS, ingredient_index,
+                            ranked_ingredient_search, recipe_ingredient_index)
+from recipes.timeline import read_timeline
 from users.models import Subscription
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, AnonymousCacheMixin,
+                    SubscribedAuthorsMixin, ModelViewSet):
     """Вьюсет рецептов."""
 
-    queryset = Recipe.objects.prefetch_related(
-        'recipe__ingredient', 'tags'
-    ).select_related('author').order_by('-pub_date')
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
     pagination_class = CustomPagination
     filterset_class = RecipeFilter
     filter_backends = (DjangoFilterBackend,)
 
+    @property
+    def paginator(self):
+        """Пагинатор: page/limit по умолчанию или курсор по запросу.
+
+        Курсор упорядочивает по дате публикации, поэтому с поиском,
+        который сортирует по релевантности, используется page/limit.
+        """
+
+        if not hasattr(self, '_paginator'):
+            search = self.request.query_params.get(SEARCH_PARAM, '').strip()
+            if uses_cursor_pagination(self.request) and not search and (
+                self.action not in ('popular', 'cook')
+            ):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_change_timestamps(self, request, *args, **kwargs):
+        """Изменения каталога или рецепта и списков пользователя."""
+
+        timestamps = [get_version_timestamp(
+            USER_VERSION_KEY.format(request.user.pk)
+        )] if request.user.is_authenticated else []
+        if self.action == 'list':
+            return timestamps + [get_version_timestamp(CATALOG_VERSION_KEY)]
+        try:
+            updated_at = Recipe.objects.filter(
+                pk=kwargs.get('pk')
+            ).values_list('updated_at', flat=True).first()
+        except ValueError:
+            return None
+        if updated_at is None:
+            return None
+        return timestamps + [
+            updated_at.timestamp(),
+            get_version_timestamp(REFERENCE_VERSION_KEY)
+        ]
+
+    def get_queryset(self):
+        """Рецепты с флагами избранного и списка покупок пользователя."""
+
+        queryset = Recipe.objects.prefetch_related(
+            'recipe', 'tagsrecipe_set'
+        ).select_related('author').order_by('-pub_date')
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
+
     def get_serializer_class(self):
         """Возвращает сериализатор в зависимости от типа метода."""
 
@@ -98,27 +173,151 @@ class RecipeViewSet(ModelViewSet):
         methods=('get',),
         url_path='download_shopping_cart',
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(PlainTextRenderer, CSVRenderer, PDFRenderer)
     )
     def download_shopping_cart(self, request):
         """Экшн для скачивания списка покупок."""
 
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shop_cart__user=request.user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
         ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(total_sum=Sum('amount'))
-        wishlist = ''
-        for ingredient in ingredients:
-            wishlist += (f'{ingredient["ingredient__name"]}: '
-                         f'{ingredient["total_sum"]}')
-            wishlist += f'{ingredient["ingredient__measurement_unit"]}.\n'
-        response = HttpResponse(wishlist, content_type='text/plain')
-        response['Content-Disposition'] = 'attachment; filename=wishlist.txt'
+            'ingredient__name', 'ingredient__measurement_unit',
+            total_sum=F('total_amount')
+        ).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_WRITERS[renderer.format](ingredients),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=wishlist.{renderer.format}'
+        )
         return response
 
+    @action(
+        methods=('get',),
+        url_path='popular',
+        detail=False
+    )
+    def popular(self, request):
+        """Экшн для популярных рецептов по недавним добавлениям."""
+
+        queryset = self.filter_queryset(self.get_queryset().filter(
+            popularity__isnull=False
+        )).order_by('-popularity__score', '-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('get',),
+        url_path='feed',
+        detail=False,
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Экшн для ленты рецептов авторов из подписок."""
+
+        paginator = TimelinePagination()
+        positions = paginator.paginate_timeline(
+            lambda position, size: read_timeline(
+                request.user, position, size
+            ),
+            request
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in positions]
+        )
+        serializer = self.get_serializer([
+            recipes[recipe_id] for _, recipe_id in positions
+            if recipe_id in recipes
+        ], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('get',),
+        url_path='cook',
+        detail=False
+    )
+    def cook(self, request):
+        """Экшн для рецептов, которые можно приготовить из ингредиентов."""
 
-class CustomUserViewSet(UserViewSet):
+        try:
+            ingredient_ids = {
+                int(ingredient_id)
+                for value in request.query_params.getlist('ingredients')
+                for ingredient_id in value.split(',') if ingredient_id
+            }
+            max_missing = int(request.query_params.get(
+                'max_missing', MAX_MISSING_INGREDIENTS
+            ))
+        except ValueError:
+            return Response(
+                'Передайте id ингредиентов и max_missing числами.',
+                status=HTTP_400_BAD_REQUEST
+            )
+        if not ingredient_ids:
+            return Response(
+                'Передайте id ингредиентов в параметре ingredients.',
+                status=HTTP_400_BAD_REQUEST
+            )
+        max_missing = min(max(max_missing, 0), MAX_MISSING_INGREDIENTS)
+        page = self.paginate_queryset(recipe_ingredient_index.search(
+            ingredient_ids, max_missing
+        ))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in page]
+        )
+        serializer = self.get_serializer([
+            recipes[recipe_id] for recipe_id, _ in page
+            if recipe_id in recipes
+        ], many=True)
+        missing = dict(page)
+        for recipe in serializer.data:
+            recipe['missing_ingredients'] = missing[recipe['id']]
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=('post',),
+        url_path='import',
+        detail=False,
+        permission_classes=(IsAdminUser,)
+    )
+    def import_recipes(self, request):
+        """Экшн для импорта рецептов из NDJSON в теле запроса."""
+
+        if request.stream is None:
+            return Response(
+                'Передайте рецепты в формате NDJSON.',
+                status=HTTP_400_BAD_REQUEST
+            )
+        with TemporaryFile('w+', encoding='utf-8') as report:
+            importer = RecipeImporter(
+                request.user,
+                lambda number, error: report.write(report_line(number, error))
+            )
+            importer.run(request.stream)
+            report_url = None
+            if importer.failed:
+                report.seek(0)
+                report_url = request.build_absolute_uri(default_storage.url(
+                    default_storage.save(
+                        f'{IMPORT_REPORTS_DIR}{uuid.uuid4()}.ndjson',
+                        File(report)
+                    )
+                ))
+        return Response({
+            'created': importer.created,
+            'failed': importer.failed,
+            'report': report_url
+        })
+
+
+class CustomUserViewSet(SubscribedAuthorsMixin, UserViewSet):
     """Вьюсет пользователя."""
 
     queryset = User.objects.all()
@@ -134,10 +333,11 @@ class CustomUserViewSet(UserViewSet):
     def subscriptions(self, request):
         """Экшн для просмотра подписок."""
 
-        subs_quryset = Subscription.objects.filter(user=request.user).annotate(
-            recipes_count=Count('author__recipes')
-        ).order_by('-author_id',)
+        subs_quryset = Subscription.objects.filter(
+            user=request.user
+        ).select_related('author').order_by('-author_id',)
         page = self.paginate_queryset(subs_quryset)
+        prefetch_author_recipes(page, get_recipes_limit(request))
         serializer = SubscribeSerializer(
             page,
             many=True,
@@ -165,6 +365,7 @@ class CustomUserViewSet(UserViewSet):
                 user=request.user,
                 author=get_object_or_404(User, pk=id)
             )
+            prefetch_author_recipes((sub,), get_recipes_limit(request))
             serializer = SubscribeSerializer(sub, context={'request': request})
             return Response(serializer.data, status=HTTP_201_CREATED)
         return Response(
@@ -173,28 +374,40 @@ class CustomUserViewSet(UserViewSet):
         )
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(ConditionalGetMixin, ReferenceCacheMixin, ModelViewSet):
     """Вьюсет тегов."""
 
     queryset = Tag.objects.all()
+    reference_cache = tags_cache
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
 
+    def get_change_timestamps(self, request, *args, **kwargs):
+        return [get_version_timestamp(REFERENCE_VERSION_KEY)]
 
-class IngredientsViewSet(ModelViewSet):
+
+class IngredientsViewSet(ConditionalGetMixin, ReferenceCacheMixin,
+                         ModelViewSet):
     """Вьюсет ингредиентов."""
 
     queryset = Ingredient.objects.all()
+    reference_cache = ingredients_cache
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
 
+    def get_change_timestamps(self, request, *args, **kwargs):
+        return [get_version_timestamp(INGREDIENTS_VERSION_KEY)]
+
     def get_queryset(self):
         """Фильтр по названию ингредиента."""
 
-        queryset = Ingredient.objects.all()
         name = self.request.query_params.get('name')
-        if name is not None:
-            queryset = queryset.filter(name__istartswith=name.lower())
-        return queryset
+        if name is None:
+            return super().get_queryset()
+        if self.request.query_params.get('ranked'):
+            return ranked_ingredient_search(name)
+        return ingredient_index.search(name, get_reference_objects(
+            self.request, self.reference_cache
+        ))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import run_next_job
+
+IDLE_SLEEP = 1.0
+RUN_COMPLETE_MSG = 'Выполнено задач: {}, с ошибкой: {}.'
+
+
+class Command(BaseCommand):
+    """Команда обработчика очереди фоновых задач."""
+
+    help = 'Выполняет задачи из очереди фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить доступные задачи и завершиться.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=IDLE_SLEEP,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        try:
+            while True:
+                # Как между запросами: закрывает разорванные и устаревшие
+                # по CONN_MAX_AGE соединения с базой.
+                close_old_connections()
+                result = run_next_job()
+                if result is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                elif result:
+                    done += 1
+                else:
+                    failed += 1
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            RUN_COMPLETE_MSG.format(done, failed)
+        ))
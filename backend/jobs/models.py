@@ -0,0 +1,60 @@
+from django.db.models import (CharField, DateTimeField, Index, JSONField,
+                              Model, PositiveSmallIntegerField, TextChoices,
+                              TextField)
+from django.utils import timezone
+
+
+class Job(Model):
+    """Модель фоновой задачи."""
+
+    class Status(TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    name = CharField(
+        verbose_name='Задача',
+        max_length=100
+    )
+    payload = JSONField(
+        verbose_name='Аргументы',
+        default=dict,
+        blank=True
+    )
+    status = CharField(
+        verbose_name='Статус',
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED
+    )
+    attempts = PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0
+    )
+    run_after = DateTimeField(
+        verbose_name='Запустить после',
+        default=timezone.now
+    )
+    last_error = TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+    created = DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('-id',)
+        indexes = [
+            Index(
+                fields=['status', 'run_after'],
+                name='job_status_run_after_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,132 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.models import Job
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(seconds=30)
+JOB_TIMEOUT = timedelta(minutes=10)
+UNKNOWN_JOB_MSG = 'Неизвестная задача: {}'
+TIMEOUT_MSG = 'Обработчик не завершил задачу за {} попыток.'
+
+JOB_HANDLERS = {}
+
+logger = logging.getLogger(__name__)
+
+
+def job(name):
+    """Регистрирует функцию как обработчик задачи с именем name."""
+
+    def register(handler):
+        JOB_HANDLERS[name] = handler
+        return handler
+    return register
+
+
+def enqueue(name, payload=None, delay=None):
+    """Ставит задачу в очередь.
+
+    Задача создается в текущей транзакции и видна обработчику
+    только после ее фиксации.
+    """
+
+    if name not in JOB_HANDLERS:
+        raise ValueError(UNKNOWN_JOB_MSG.format(name))
+    run_after = timezone.now()
+    if delay is not None:
+        run_after += delay
+    return Job.objects.create(
+        name=name, payload=payload or {}, run_after=run_after
+    )
+
+
+def enqueue_many(name, payloads):
+    """Ставит в очередь задачи с одним обработчиком одним запросом."""
+
+    if name not in JOB_HANDLERS:
+        raise ValueError(UNKNOWN_JOB_MSG.format(name))
+    return Job.objects.bulk_create(
+        Job(name=name, payload=payload) for payload in payloads
+    )
+
+
+def claim_job():
+    """Забирает из очереди ближайшую задачу.
+
+    Задача помечается выполняемой до now + JOB_TIMEOUT, после чего ее
+    может забрать другой обработчик, если этот не успел ее завершить.
+    Зависшие задачи, исчерпавшие MAX_ATTEMPTS попыток, помечаются
+    упавшими и больше не забираются.
+    """
+
+    now = timezone.now()
+    with transaction.atomic():
+        Job.objects.filter(
+            status=Job.Status.RUNNING,
+            run_after__lte=now,
+            attempts__gte=MAX_ATTEMPTS
+        ).update(
+            status=Job.Status.FAILED,
+            last_error=TIMEOUT_MSG.format(MAX_ATTEMPTS)
+        )
+        claimed = Job.objects.select_for_update(skip_locked=True).filter(
+            status__in=(Job.Status.QUEUED, Job.Status.RUNNING),
+            run_after__lte=now,
+            attempts__lt=MAX_ATTEMPTS
+        ).order_by('run_after', 'id').first()
+        if claimed is None:
+            return None
+        claimed.status = Job.Status.RUNNING
+        claimed.attempts += 1
+        claimed.run_after = now + JOB_TIMEOUT
+        claimed.save(update_fields=('status', 'attempts', 'run_after'))
+    return claimed
+
+
+def run_job(claimed):
+    """Выполняет задачу и сохраняет ее результат.
+
+    Упавшая задача перезапускается с растущей задержкой, пока не
+    исчерпает MAX_ATTEMPTS попыток. У выполненной задачи аргументы
+    очищаются, чтобы в таблице не копились картинки в base64.
+    """
+
+    try:
+        handler = JOB_HANDLERS.get(claimed.name)
+        if handler is None:
+            raise LookupError(UNKNOWN_JOB_MSG.format(claimed.name))
+        with transaction.atomic():
+            handler(**claimed.payload)
+    except Exception:
+        logger.exception('Задача %s завершилась с ошибкой', claimed)
+        claimed.last_error = traceback.format_exc()
+        if claimed.attempts < MAX_ATTEMPTS:
+            claimed.status = Job.Status.QUEUED
+            claimed.run_after = timezone.now() + RETRY_DELAY * (
+                2 ** (claimed.attempts - 1)
+            )
+        else:
+            claimed.status = Job.Status.FAILED
+    else:
+        claimed.status = Job.Status.DONE
+        claimed.payload = {}
+    claimed.save(
+        update_fields=('status', 'run_after', 'last_error', 'payload')
+    )
+    return claimed.status == Job.Status.DONE
+
+
+def run_next_job():
+    """Выполняет одну задачу из очереди, если она есть.
+
+    Возвращает None, если очередь пуста, иначе признак успеха.
+    """
+
+    claimed = claim_job()
+    if claimed is None:
+        return None
+    return run_job(claimed)
@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from jobs.models import Job
+from jobs.queue import MAX_ATTEMPTS, job, run_next_job
+
+TEST_JOB = 'jobs.test'
+FAILING_JOB = 'jobs.test_failing'
+
+
+@job(TEST_JOB)
+def succeeding_job(**payload):
+    """Задача, которая всегда выполняется."""
+
+
+@job(FAILING_JOB)
+def failing_job(**payload):
+    """Задача, которая всегда падает."""
+
+    raise ValueError
+
+
+class RunJobTest(TestCase):
+    """Выполнение задач из очереди."""
+
+    def test_done_job_payload_is_cleared(self):
+        queued = Job.objects.create(name=TEST_JOB, payload={'image': 'x'})
+        self.assertIs(run_next_job(), True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.Status.DONE)
+        self.assertEqual(queued.payload, {})
+
+    def test_failed_job_keeps_payload(self):
+        queued = Job.objects.create(
+            name=FAILING_JOB, payload={'image': 'x'},
+            attempts=MAX_ATTEMPTS - 1
+        )
+        self.assertIs(run_next_job(), False)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.Status.FAILED)
+        self.assertEqual(queued.payload, {'image': 'x'})
+
+    def test_stale_job_without_attempts_is_failed(self):
+        stale = Job.objects.create(
+            name=TEST_JOB, status=Job.Status.RUNNING, attempts=MAX_ATTEMPTS
+        )
+        self.assertIsNone(run_next_job())
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.Status.FAILED)
+        self.assertEqual(stale.attempts, MAX_ATTEMPTS)
@@ -3,25 +3,29 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
 from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
-                            Recipe, ShoppingCart, Tag, TagsRecipe)
+                            PopularityRefresh, Recipe, ShoppingCart, Tag,
+                            TagsRecipe)
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'color', 'slug')
-    search_fields = ('name',)
-    list_filter = ('name', 'color')
+    search_fields = ('name', 'slug')
     prepopulated_fields = {'slug': ('name',)}
 
 
 class IngredientRecipeInline(admin.StackedInline):
     model = IngredientRecipe
     min_num = 1
+    ordering = ('ingredient__name',)
+    autocomplete_fields = ('ingredient',)
 
 
 class TagsRecipeInline(admin.StackedInline):
     model = TagsRecipe
     min_num = 1
+    ordering = ('tag__name',)
+    autocomplete_fields = ('tag',)
 
 
 @admin.register(Recipe)
@@ -29,12 +33,14 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'name', 'author', 'cooking_time', 'recipe_added_to_favorite'
     )
-    search_fields = ('id', 'name', 'author')
-    list_filter = ('name', 'author', 'tags')
+    search_fields = ('name', 'author__username', 'author__email')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
     inlines = (IngredientRecipeInline, TagsRecipeInline)
 
     def recipe_added_to_favorite(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
     recipe_added_to_favorite.short_description = 'Добавлен в избранное'
 
 
@@ -49,24 +55,43 @@ class IngredientAdmin(ImportExportModelAdmin):
     resource_classes = (IngredientResource,)
     list_display = ('id', 'name', 'measurement_unit')
     search_fields = ('name',)
-    list_filter = ('name',)
 
 
 @admin.register(FavoriteRecipe)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
+    search_fields = ('recipe__name', 'user__username')
+    list_select_related = ('recipe', 'user')
+    autocomplete_fields = ('recipe', 'user')
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
+    search_fields = ('recipe__name', 'user__username')
+    list_select_related = ('recipe', 'user')
+    autocomplete_fields = ('recipe', 'user')
 
 
 @admin.register(TagsRecipe)
 class TagsRecipeAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'tag')
+    search_fields = ('recipe__name',)
+    ordering = ('recipe__name',)
+    list_filter = ('tag',)
+    list_select_related = ('recipe', 'tag')
+    autocomplete_fields = ('recipe', 'tag')
 
 
 @admin.register(IngredientRecipe)
 class IngredientRecipeAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    ordering = ('ingredient__name',)
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+
+@admin.register(PopularityRefresh)
+class PopularityRefreshAdmin(admin.ModelAdmin):
+    list_display = ('until', 'events', 'created')
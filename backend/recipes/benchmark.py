@@ -0,0 +1,147 @@
+import gc
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.seeding import (SEED_INGREDIENT_NAME, seed_activity, seed_catalog,
+                             seed_popularity, seed_user)
+
+AUTHORS_PER_SCALE = 10
+SIZE_TOLERANCE = 1.1
+
+STATUS_MSG = '{}: ответ {}'
+REGRESSION_MSG = '{} рецептов, {}: {} {} вместо {}'
+
+
+class BenchmarkError(Exception):
+    """Запрос замера вернул ответ с ошибкой."""
+
+
+class ApiBenchmark:
+    """Синтетический каталог и замер основных запросов API.
+
+    Каталог наращивается до каждого размера по очереди и состоит
+    только из синтетических авторов, тегов и ингредиентов, поэтому
+    результаты не зависят от данных, уже лежащих в базе.
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.seeded = 0
+        self.client = APIClient()
+        self.newcomer = APIClient()
+        self.newcomer.force_authenticate(seed_user())
+        self.user = None
+
+    def seed(self, scale):
+        """Дополняет каталог до scale рецептов."""
+
+        authors = [
+            seed_catalog(size, self.generator) for size in (
+                (scale - self.seeded) // AUTHORS_PER_SCALE,
+            ) * AUTHORS_PER_SCALE if size
+        ]
+        self.seeded = scale
+        if self.user is None:
+            self.user = seed_user()
+            seed_activity(self.user, authors, self.generator)
+            self.client.force_authenticate(self.user)
+        seed_popularity(self.generator)
+
+    def get_endpoints(self):
+        recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+        return {
+            'recipes': (self.client, '/api/recipes/'),
+            'recipe': (self.client, f'/api/recipes/{recipe.pk}/'),
+            'subscriptions': (
+                self.client, '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            'subscriptions_empty': (
+                self.newcomer, '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            'users': (self.client, '/api/users/'),
+            'ingredients': (
+                self.client,
+                f'/api/ingredients/?name={SEED_INGREDIENT_NAME.format(1)}'
+            ),
+            'shopping_cart': (
+                self.client, '/api/recipes/download_shopping_cart/'
+            ),
+        }
+
+    def request(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise BenchmarkError(STATUS_MSG.format(url, response.status_code))
+        if response.streaming:
+            return len(b''.join(response.streaming_content))
+        return len(response.content)
+
+    def measure(self, client, url, requests):
+        """Число запросов к базе, размер ответа и, если requests, задержка.
+
+        Как и timeit, сборщик мусора отключается на время замеров:
+        полная сборка случайно попадает в один из запросов и задает p95.
+        """
+
+        self.request(client, url)
+        with CaptureQueriesContext(connection) as queries:
+            size = self.request(client, url)
+        # Лог запросов очищается в начале каждого запроса к API.
+        result = {'queries': len(queries), 'bytes': size}
+        if not requests:
+            return result
+        timings = []
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(requests):
+                start = time.perf_counter()
+                self.request(client, url)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+        result['p50_ms'] = round(statistics.median(timings), 3)
+        result['p95_ms'] = round(statistics.quantiles(timings, n=20)[-1], 3)
+        return result
+
+    def measure_all(self, requests):
+        return {
+            name: self.measure(client, url, requests)
+            for name, (client, url) in self.get_endpoints().items()
+        }
+
+
+def compare(results, baseline, latency_tolerance=0):
+    """Список ухудшений относительно базовых результатов.
+
+    Задержка сравнивается, только если задан latency_tolerance
+    и задержка замерена.
+    """
+
+    regressions = []
+    for scale, endpoints in results.items():
+        for name, result in endpoints.items():
+            expected = baseline.get(scale, {}).get(name)
+            if expected is None:
+                continue
+            checks = [
+                ('queries', result['queries'] > expected['queries']),
+                ('bytes', result['bytes'] > (
+                    expected['bytes'] * SIZE_TOLERANCE
+                )),
+            ]
+            if latency_tolerance and 'p95_ms' in result:
+                checks.append(('p95_ms', result['p95_ms'] > (
+                    expected['p95_ms'] * latency_tolerance
+                )))
+            regressions += [
+                REGRESSION_MSG.format(
+                    scale, name, metric, result[metric], expected[metric]
+                ) for metric, failed in checks if failed
+            ]
+    return regressions
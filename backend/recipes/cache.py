@@ -0,0 +1,126 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.core.cache import caches
+
+from recipes.models import Ingredient, Tag
+
+INGREDIENTS_VERSION_KEY = 'ingredients_version'
+TAGS_VERSION_KEY = 'tags_version'
+CATALOG_VERSION_KEY = 'catalog_version'
+REFERENCE_VERSION_KEY = 'reference_version'
+USER_VERSION_KEY = 'user_version:{}'
+VERSIONS_CACHE = 'versions'
+LOCAL_VERSIONS_CACHE = 'local_versions'
+
+request_versions = ContextVar('request_versions', default=None)
+
+
+@contextmanager
+def remember_versions():
+    """Запоминает прочитанные версии до выхода из блока."""
+
+    token = request_versions.set({})
+    try:
+        yield
+    finally:
+        request_versions.reset(token)
+
+
+def get_version(key):
+    """Возвращает текущую версию данных.
+
+    Версии хранятся в отдельном кеше в базе, поэтому их изменение
+    видно всем процессам приложения и management-командам и не
+    вытесняется ответами из кеша по умолчанию. Прочитанная версия
+    держится в памяти процесса на время TIMEOUT кеша local_versions:
+    повторные чтения в запросе и в соседних запросах не обращаются
+    к базе, а изменение из другого процесса видно с этой задержкой.
+    Внутри remember_versions каждая версия читается один раз.
+    """
+
+    remembered = request_versions.get()
+    if remembered is not None and key in remembered:
+        return remembered[key]
+    local_versions = caches[LOCAL_VERSIONS_CACHE]
+    version = local_versions.get(key)
+    if version is None:
+        versions = caches[VERSIONS_CACHE]
+        version = versions.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not versions.add(key, version, None):
+                version = versions.get(key, version)
+        local_versions.set(key, version)
+    if remembered is not None:
+        remembered[key] = version
+    return version
+
+
+def bump_version(key):
+    """Сбрасывает все локальные копии данных с этой версией."""
+
+    version = time.time_ns()
+    caches[VERSIONS_CACHE].set(key, version, None)
+    caches[LOCAL_VERSIONS_CACHE].set(key, version)
+    remembered = request_versions.get()
+    if remembered is not None:
+        remembered[key] = version
+
+
+def get_version_timestamp(key):
+    """Возвращает момент последнего изменения версии в секундах."""
+
+    return get_version(key) / 10 ** 9
+
+
+class ReferenceCache:
+    """Копия небольшой справочной таблицы в памяти процесса.
+
+    Строки загружаются одним запросом при первом обращении и
+    перезагружаются, когда любой процесс сменит версию таблицы.
+    """
+
+    def __init__(self, model, version_key):
+        self.model = model
+        self.version_key = version_key
+        self._objects = (None, {})
+        self._lock = Lock()
+
+    def __deepcopy__(self, memo):
+        # Копия общая для процесса, поля сериализаторов не копируют ее.
+        return self
+
+    def get_objects(self):
+        """Возвращает словарь объектов по первичному ключу."""
+
+        version = get_version(self.version_key)
+        if self._objects[0] != version:
+            with self._lock:
+                if self._objects[0] != version:
+                    self._objects = (version, {
+                        obj.pk: obj for obj in self.model.objects.all()
+                    })
+        return self._objects[1]
+
+    def all(self):
+        """Возвращает все объекты в порядке сортировки модели."""
+
+        return list(self.get_objects().values())
+
+    def get(self, pk):
+        """Возвращает объект по ключу или None, если его нет в базе.
+
+        Объект, созданный после загрузки копии, читается из базы.
+        """
+
+        obj = self.get_objects().get(pk)
+        if obj is None:
+            obj = self.model.objects.filter(pk=pk).first()
+        return obj
+
+
+tags_cache = ReferenceCache(Tag, TAGS_VERSION_KEY)
+ingredients_cache = ReferenceCache(Ingredient, INGREDIENTS_VERSION_KEY)
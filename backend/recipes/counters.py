@@ -0,0 +1,30 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe
+from users.models import Subscription, User
+
+COUNTERS = (
+    (FavoriteRecipe, 'recipe', Recipe, 'favorites_count'),
+    (Recipe, 'author', User, 'recipes_count'),
+    (Subscription, 'author', User, 'followers_count'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счетчик записи на delta, не опуская его ниже нуля."""
+
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def actual_count(child, key):
+    """Подзапрос с настоящим числом связанных записей."""
+
+    return Coalesce(Subquery(
+        child.objects.filter(**{key: OuterRef('pk')}).order_by().values(
+            key
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
@@ -0,0 +1,136 @@
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+IMAGE_VARIANT_SIZES = {
+    'small': 320,
+    'medium': 640,
+}
+IMAGE_VARIANT_FORMATS = {
+    'jpg': 'JPEG',
+    'webp': 'WEBP',
+}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANTS_DIR = 'recipes/variants/'
+PLACEHOLDER_IMAGE = 'recipes/placeholder.png'
+PLACEHOLDER_SIZE = (640, 480)
+PLACEHOLDER_COLOR = '#e6e6e6'
+SOURCE = 'source'
+ORIGINAL = 'original'
+
+logger = logging.getLogger(__name__)
+
+
+def save_variant(image, path, image_format):
+    """Сохраняет копию картинки в хранилище и возвращает ее путь."""
+
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A')
+                         if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=IMAGE_VARIANT_QUALITY)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def get_placeholder_image():
+    """Возвращает путь к заглушке картинки, создавая ее при необходимости."""
+
+    if not default_storage.exists(PLACEHOLDER_IMAGE):
+        buffer = BytesIO()
+        Image.new('RGB', PLACEHOLDER_SIZE, PLACEHOLDER_COLOR).save(
+            buffer, 'PNG'
+        )
+        default_storage.save(PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue()))
+    return PLACEHOLDER_IMAGE
+
+
+def is_same_image(image_field, content):
+    """Проверяет, что в поле картинки уже сохранен тот же файл."""
+
+    if not image_field or image_field.name == PLACEHOLDER_IMAGE:
+        return False
+    try:
+        if image_field.size != content.size:
+            return False
+        with image_field.open('rb') as file:
+            same = file.read() == content.read()
+    except OSError:
+        return False
+    content.seek(0)
+    return same
+
+
+def needs_image_variants(recipe):
+    """Проверяет, что для картинки рецепта еще нет копий."""
+
+    return bool(recipe.image) and recipe.image.name != PLACEHOLDER_IMAGE and (
+        recipe.image_variants.get(SOURCE) != recipe.image.name
+    )
+
+
+def delete_image_variants(variants):
+    """Удаляет файлы копий картинки из хранилища."""
+
+    for name, formats in variants.items():
+        if name == SOURCE:
+            continue
+        for path in formats.values():
+            default_storage.delete(path)
+
+
+def make_image_variants(image_field):
+    """Создает уменьшенные копии картинки и их WebP-версии.
+
+    Возвращает словарь путей вида {'small': {'jpg': ..., 'webp': ...}},
+    в ключе source хранится имя исходного файла.
+    """
+
+    with image_field.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    stem = os.path.splitext(os.path.basename(image_field.name))[0]
+    variants = {
+        SOURCE: image_field.name,
+        ORIGINAL: {'webp': save_variant(
+            image, f'{IMAGE_VARIANTS_DIR}{stem}.webp', 'WEBP'
+        )},
+    }
+    for name, size in IMAGE_VARIANT_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        variants[name] = {
+            extension: save_variant(
+                thumbnail, f'{IMAGE_VARIANTS_DIR}{stem}_{name}.{extension}',
+                image_format
+            ) for extension, image_format in IMAGE_VARIANT_FORMATS.items()
+        }
+    return variants
+
+
+def refresh_image_variants(recipe, force=False):
+    """Пересоздает копии картинки рецепта, если картинка изменилась.
+
+    Возвращает True, если копии были созданы.
+    """
+
+    if not force and not needs_image_variants(recipe):
+        return False
+    if not recipe.image or recipe.image.name == PLACEHOLDER_IMAGE:
+        return False
+    try:
+        variants = make_image_variants(recipe.image)
+    except (OSError, ValueError) as error:
+        logger.warning('Не удалось обработать %s: %s', recipe.image, error)
+        return False
+    delete_image_variants(recipe.image_variants)
+    recipe.image_variants = variants
+    recipe.save(update_fields=('image_variants', 'updated_at'))
+    return True
@@ -0,0 +1,233 @@
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from jobs.queue import enqueue_many
+from recipes.cache import CATALOG_VERSION_KEY, bump_version
+from recipes.counters import change_counter
+from recipes.images import get_placeholder_image
+from recipes.models import (MAX_VALUE, MIN_VALUE, Ingredient, IngredientRecipe,
+                            Recipe, Tag, TagsRecipe)
+from recipes.tasks import FAN_OUT_JOB, STORE_IMAGE_JOB
+from users.models import User
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_REPORTS_DIR = 'imports/'
+NAME_MAX_LENGTH = 200
+
+INVALID_JSON_MSG = 'Некорректный JSON: {}'
+NOT_OBJECT_MSG = 'Строка должна быть JSON-объектом.'
+REQUIRED_FIELD_MSG = 'Обязательное поле: {}.'
+INVALID_FIELD_MSG = 'Некорректное значение поля {}.'
+UNKNOWN_TAGS_MSG = 'Неизвестные теги: {}.'
+UNKNOWN_INGREDIENTS_MSG = 'Неизвестные ингредиенты: {}.'
+DUPLICATE_RECIPE_MSG = 'У автора уже есть рецепт «{}».'
+CHUNK_FAILED_MSG = 'Пачка не записана: {}'
+
+
+class ImportLineError(Exception):
+    """Ошибка в строке импорта."""
+
+
+def report_line(number, error):
+    """Строка отчета об ошибке импорта в формате NDJSON."""
+
+    return json.dumps(
+        {'line': number, 'error': error}, ensure_ascii=False
+    ) + '\n'
+
+
+def is_amount(value):
+    return (
+        isinstance(value, int) and not isinstance(value, bool)
+        and MIN_VALUE <= value <= MAX_VALUE
+    )
+
+
+def parse_line(line):
+    """Разбирает строку NDJSON и проверяет поля рецепта.
+
+    Теги задаются слагами, ингредиенты — названием, единицей измерения
+    и количеством; картинка в base64 необязательна.
+    """
+
+    try:
+        data = json.loads(line)
+    except ValueError as error:
+        raise ImportLineError(INVALID_JSON_MSG.format(error))
+    if not isinstance(data, dict):
+        raise ImportLineError(NOT_OBJECT_MSG)
+    for field in ('name', 'text', 'cooking_time', 'tags', 'ingredients'):
+        if field not in data:
+            raise ImportLineError(REQUIRED_FIELD_MSG.format(field))
+    name = data['name']
+    if not isinstance(name, str) or not 0 < len(name) <= NAME_MAX_LENGTH:
+        raise ImportLineError(INVALID_FIELD_MSG.format('name'))
+    if not isinstance(data['text'], str):
+        raise ImportLineError(INVALID_FIELD_MSG.format('text'))
+    if not is_amount(data['cooking_time']):
+        raise ImportLineError(INVALID_FIELD_MSG.format('cooking_time'))
+    tags = data['tags']
+    if not tags or not isinstance(tags, list) or not all(
+        isinstance(slug, str) for slug in tags
+    ):
+        raise ImportLineError(INVALID_FIELD_MSG.format('tags'))
+    ingredients = data['ingredients']
+    if not ingredients or not isinstance(ingredients, list) or not all(
+        isinstance(ingredient, dict)
+        and isinstance(ingredient.get('name'), str)
+        and isinstance(ingredient.get('measurement_unit'), str)
+        and is_amount(ingredient.get('amount'))
+        for ingredient in ingredients
+    ):
+        raise ImportLineError(INVALID_FIELD_MSG.format('ingredients'))
+    image = data.get('image')
+    if image is not None and not isinstance(image, str):
+        raise ImportLineError(INVALID_FIELD_MSG.format('image'))
+    return data
+
+
+class RecipeImporter:
+    """Импорт рецептов из NDJSON пачками по chunk_size строк.
+
+    Теги и ингредиенты пачки находятся двумя запросами, рецепты и их
+    связи создаются через bulk_create, каждая пачка пишется в своей
+    транзакции. Ошибки строк передаются в report(номер строки, текст),
+    картинки сохраняются фоновыми задачами.
+    """
+
+    def __init__(self, author, report, chunk_size=IMPORT_CHUNK_SIZE):
+        self.author = author
+        self.report = report
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.failed = 0
+
+    def fail(self, number, message):
+        self.failed += 1
+        self.report(number, message)
+
+    def run(self, lines):
+        """Импортирует строки и возвращает число созданных рецептов."""
+
+        numbered = (
+            (number, line) for number, line in enumerate(lines, 1)
+            if line.strip()
+        )
+        while True:
+            chunk = list(islice(numbered, self.chunk_size))
+            if not chunk:
+                return self.created
+            self.import_chunk(chunk)
+
+    def parse_chunk(self, chunk):
+        parsed = []
+        for number, line in chunk:
+            try:
+                parsed.append((number, parse_line(line)))
+            except ImportLineError as error:
+                self.fail(number, str(error))
+        return parsed
+
+    def resolve_chunk(self, parsed):
+        """Находит теги, ингредиенты и занятые названия пачки."""
+
+        tags = {
+            tag.slug: tag for tag in Tag.objects.filter(slug__in={
+                slug for _, data in parsed for slug in data['tags']
+            })
+        }
+        ingredients = {
+            (ingredient.name, ingredient.measurement_unit): ingredient
+            for ingredient in Ingredient.objects.filter(name__in={
+                ingredient['name'] for _, data in parsed
+                for ingredient in data['ingredients']
+            })
+        }
+        taken_names = set(Recipe.objects.filter(
+            author=self.author,
+            name__in={data['name'] for _, data in parsed}
+        ).values_list('name', flat=True))
+        return tags, ingredients, taken_names
+
+    def build_recipes(self, parsed):
+        """Проверяет ссылки строк и собирает объекты для записи."""
+
+        tags, ingredients, taken_names = self.resolve_chunk(parsed)
+        placeholder = get_placeholder_image()
+        rows = []
+        for number, data in parsed:
+            unknown_tags = [
+                slug for slug in data['tags'] if slug not in tags
+            ]
+            if unknown_tags:
+                self.fail(number, UNKNOWN_TAGS_MSG.format(
+                    ', '.join(unknown_tags)
+                ))
+                continue
+            amounts = {}
+            unknown_ingredients = []
+            for ingredient in data['ingredients']:
+                key = (ingredient['name'], ingredient['measurement_unit'])
+                if key in ingredients:
+                    amounts[ingredients[key]] = ingredient['amount']
+                else:
+                    unknown_ingredients.append('{} ({})'.format(*key))
+            if unknown_ingredients:
+                self.fail(number, UNKNOWN_INGREDIENTS_MSG.format(
+                    ', '.join(unknown_ingredients)
+                ))
+                continue
+            if data['name'] in taken_names:
+                self.fail(number, DUPLICATE_RECIPE_MSG.format(data['name']))
+                continue
+            taken_names.add(data['name'])
+            recipe = Recipe(
+                author=self.author,
+                name=data['name'],
+                description=data['text'],
+                cooking_time=data['cooking_time'],
+                image=placeholder
+            )
+            rows.append((
+                number, recipe, {tags[slug] for slug in data['tags']},
+                amounts, data.get('image')
+            ))
+        return rows
+
+    def import_chunk(self, chunk):
+        rows = self.build_recipes(self.parse_chunk(chunk))
+        if not rows:
+            return
+        try:
+            with transaction.atomic():
+                Recipe.objects.bulk_create(recipe for _, recipe, *_ in rows)
+                TagsRecipe.objects.bulk_create(
+                    TagsRecipe(recipe=recipe, tag=tag)
+                    for _, recipe, tags, _, _ in rows for tag in tags
+                )
+                IngredientRecipe.objects.bulk_create(
+                    IngredientRecipe(
+                        recipe=recipe, ingredient=ingredient, amount=amount
+                    ) for _, recipe, _, amounts, _ in rows
+                    for ingredient, amount in amounts.items()
+                )
+                change_counter(
+                    User, self.author.pk, 'recipes_count', len(rows)
+                )
+                enqueue_many(FAN_OUT_JOB, (
+                    {'recipe_id': recipe.pk} for _, recipe, *_ in rows
+                ))
+                enqueue_many(STORE_IMAGE_JOB, (
+                    {'recipe_id': recipe.pk, 'image': image}
+                    for _, recipe, _, _, image in rows if image
+                ))
+                transaction.on_commit(
+                    lambda: bump_version(CATALOG_VERSION_KEY)
+                )
+        except DatabaseError as error:
+            for number, *_ in rows:
+                self.fail(number, CHUNK_FAILED_MSG.format(error))
+            return
+        self.created += len(rows)
@@ -0,0 +1,117 @@
+import json
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from recipes.benchmark import ApiBenchmark, BenchmarkError, compare
+
+DEFAULT_SCALES = (1_000, 10_000, 100_000)
+DEFAULT_BASELINE = settings.BASE_DIR.parent / 'data' / 'benchmark_api.json'
+TEST_HOST = 'testserver'
+
+DEBUG_MSG = 'Задержка с DEBUG=True не показательна, выключите DEBUG.'
+SCALE_MSG = 'Рецептов: {}'
+RESULT_MSG = (
+    '  {:<20} запросов {:>3}, медиана {:8.2f} мс, p95 {:8.2f} мс, '
+    '{:>8} байт'
+)
+NO_BASELINE_MSG = 'Базовых результатов {} нет, сравнение пропущено.'
+BASELINE_SAVED_MSG = 'Базовые результаты записаны в {}.'
+REGRESSIONS_MSG = 'Производительность API ухудшилась: {}.'
+
+
+class Command(BaseCommand):
+    """Команда для замера основных запросов API на разных объемах."""
+
+    help = (
+        'Заполняет базу синтетическими каталогами нескольких размеров во '
+        'временной транзакции и замеряет число запросов к базе, задержку '
+        'и размер ответа основных запросов API. Результаты сравниваются '
+        'с базовыми, команда завершается ошибкой при ухудшении.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', type=int, nargs='+', default=DEFAULT_SCALES,
+            help='Размеры каталога по возрастанию.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Количество замеров каждого запроса.'
+        )
+        parser.add_argument(
+            '--output', type=Path,
+            help='Файл JSON для результатов.'
+        )
+        parser.add_argument(
+            '--baseline', type=Path, default=DEFAULT_BASELINE,
+            help='Файл JSON с базовыми результатами.'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты как базовые вместо сравнения.'
+        )
+        parser.add_argument(
+            '--latency-tolerance', type=float, default=1.5,
+            help=(
+                'Допустимый рост p95 относительно базового; 0 отключает '
+                'сравнение задержки.'
+            )
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора случайных данных.'
+        )
+
+    def run(self, scales, requests, generator):
+        results = {}
+        benchmark = ApiBenchmark(generator)
+        for scale in sorted(scales):
+            benchmark.seed(scale)
+            self.stdout.write(SCALE_MSG.format(scale))
+            results[str(scale)] = benchmark.measure_all(requests)
+            for name, result in results[str(scale)].items():
+                self.stdout.write(RESULT_MSG.format(
+                    name, result['queries'], result['p50_ms'],
+                    result['p95_ms'], result['bytes']
+                ))
+        return results
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            raise CommandError(DEBUG_MSG)
+        with transaction.atomic(), override_settings(
+            ALLOWED_HOSTS=[TEST_HOST]
+        ):
+            try:
+                results = self.run(
+                    options['scales'], options['requests'],
+                    random.Random(options['seed'])
+                )
+            except BenchmarkError as error:
+                raise CommandError(error)
+            transaction.set_rollback(True)
+        report = json.dumps(results, ensure_ascii=False, indent=2)
+        if options['output']:
+            options['output'].write_text(report)
+        if options['update_baseline']:
+            options['baseline'].write_text(report)
+            self.stdout.write(self.style.SUCCESS(
+                BASELINE_SAVED_MSG.format(options['baseline'])
+            ))
+            return
+        if not options['baseline'].exists():
+            self.stdout.write(NO_BASELINE_MSG.format(options['baseline']))
+            return
+        regressions = compare(
+            results, json.loads(options['baseline'].read_text()),
+            options['latency_tolerance']
+        )
+        for regression in regressions:
+            self.stdout.write(regression, self.style.ERROR)
+        if regressions:
+            raise CommandError(REGRESSIONS_MSG.format(len(regressions)))
@@ -0,0 +1,91 @@
+import random
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from recipes.models import IngredientRecipe
+from recipes.search import MAX_MISSING_INGREDIENTS, RecipeIngredientIndex
+from recipes.seeding import seed_catalog
+
+RESULT_MSG = '{:<8} медиана {:8.3f} мс, p95 {:8.3f} мс'
+BUILD_MSG = 'Индекс по {} рецептам построен за {:.1f} мс.'
+
+
+def orm_search(ingredient_ids, max_missing=MAX_MISSING_INGREDIENTS):
+    """Тот же поиск агрегирующим запросом к базе."""
+
+    return list(IngredientRecipe.objects.values('recipe').annotate(
+        total=Count('id'),
+        matched=Count('id', filter=Q(ingredient__in=ingredient_ids))
+    ).filter(
+        matched__gt=0, total__lte=F('matched') + max_missing
+    ).order_by(
+        F('total') - F('matched'), '-matched', '-recipe_id'
+    ).values_list('recipe', F('total') - F('matched')))
+
+
+class Command(BaseCommand):
+    """Команда для сравнения поиска рецептов по ингредиентам."""
+
+    help = (
+        'Сравнивает поиск рецептов по имеющимся ингредиентам через индекс '
+        'в памяти и через ORM на синтетическом каталоге.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=10_000,
+            help='Размер синтетического каталога.'
+        )
+        parser.add_argument(
+            '--queries', type=int, default=200,
+            help='Количество поисковых запросов.'
+        )
+        parser.add_argument(
+            '--pantry', type=int, default=15,
+            help='Количество ингредиентов в одном запросе.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора случайных данных.'
+        )
+
+    def measure(self, search, queries):
+        timings = []
+        for ingredient_ids in queries:
+            start = time.perf_counter()
+            search(ingredient_ids)
+            timings.append((time.perf_counter() - start) * 1000)
+        return (
+            statistics.median(timings),
+            statistics.quantiles(timings, n=20)[-1]
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        seed_catalog(options['recipes'], generator)
+        ingredients = list(IngredientRecipe.objects.values_list(
+            'ingredient_id', flat=True
+        ).distinct())
+        queries = [
+            generator.sample(
+                ingredients, min(options['pantry'], len(ingredients))
+            ) for _ in range(options['queries'])
+        ]
+        index = RecipeIngredientIndex()
+        start = time.perf_counter()
+        index.search(())
+        self.stdout.write(BUILD_MSG.format(
+            options['recipes'], (time.perf_counter() - start) * 1000
+        ))
+        results = {
+            'index': self.measure(index.search, queries),
+            'orm': self.measure(orm_search, queries),
+        }
+        for name, (median, p95) in results.items():
+            self.stdout.write(RESULT_MSG.format(name, median, p95))
+        transaction.set_rollback(True)
@@ -0,0 +1,62 @@
+import random
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.models import Ingredient
+from recipes.search import ingredient_index
+
+NO_INGREDIENTS_MSG = (
+    'В базе нет ингредиентов, загрузите их командой load_ingredients.'
+)
+RESULT_MSG = '{:<8} медиана {:8.3f} мс, p95 {:8.3f} мс'
+
+
+class Command(BaseCommand):
+    """Команда для сравнения поиска ингредиентов в памяти и через ORM."""
+
+    help = 'Сравнивает задержку поиска ингредиентов по началу названия.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=500,
+            help='Количество поисковых запросов.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора случайных префиксов.'
+        )
+
+    def measure(self, search, prefixes):
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            search(prefix)
+            timings.append((time.perf_counter() - start) * 1000)
+        return (
+            statistics.median(timings),
+            statistics.quantiles(timings, n=20)[-1]
+        )
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError(NO_INGREDIENTS_MSG)
+        generator = random.Random(options['seed'])
+        prefixes = [
+            name[:generator.randint(1, 4)]
+            for name in generator.choices(names, k=options['queries'])
+        ]
+        ingredient_index.search('')
+        results = {
+            'index': self.measure(ingredient_index.search, prefixes),
+            'orm': self.measure(
+                lambda prefix: list(
+                    Ingredient.objects.filter(name__istartswith=prefix)
+                ),
+                prefixes
+            ),
+        }
+        for name, (median, p95) in results.items():
+            self.stdout.write(RESULT_MSG.format(name, median, p95))
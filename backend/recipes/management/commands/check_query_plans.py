@@ -0,0 +1,84 @@
+import random
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from recipes.query_plans import (SEQ_SCAN_RE, QueryPlanError, get_query_plans,
+                                 missing_index, seed_plan_endpoints, seq_scans)
+
+TEST_HOST = 'testserver'
+PLAN_OK_MSG = 'OK      {:<24} запросов: {}'
+PLAN_FAILED_MSG = 'SEQSCAN {:<24} {}'
+INDEX_MISSING_MSG = 'NOINDEX {:<24} {}'
+SEQ_SCANS_MSG = (
+    'Последовательное чтение таблиц или нет ожидаемого индекса '
+    'в запросах: {}.'
+)
+
+
+class Command(BaseCommand):
+    """Команда для проверки планов основных запросов API."""
+
+    help = (
+        'Заполняет базу синтетическими данными во временной транзакции, '
+        'выполняет основные запросы API и проверяет их планы через '
+        'EXPLAIN. Завершается ошибкой, если план читает таблицу целиком '
+        'или не использует индекс, созданный для запроса. '
+        'На небольшом каталоге ту же проверку выполняет тест '
+        'QueryPlansTest.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=2000,
+            help='Количество рецептов у каждого автора.'
+        )
+        parser.add_argument(
+            '--authors', type=int, default=3,
+            help='Количество авторов.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора случайных данных.'
+        )
+
+    def check_plans(self, plans):
+        failed = []
+        for name, queries in plans.items():
+            scans = seq_scans(queries)
+            index = missing_index(name, queries)
+            if scans:
+                failed.append(name)
+                for sql, plan in queries:
+                    if SEQ_SCAN_RE.search(plan):
+                        self.stdout.write(
+                            f'{sql}\n{plan}\n', self.style.NOTICE
+                        )
+                self.stdout.write(PLAN_FAILED_MSG.format(
+                    name, ', '.join(scans)
+                ), self.style.ERROR)
+            elif index:
+                failed.append(name)
+                self.stdout.write(
+                    INDEX_MISSING_MSG.format(name, index), self.style.ERROR
+                )
+            else:
+                self.stdout.write(PLAN_OK_MSG.format(name, len(queries)))
+        return failed
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=[TEST_HOST]):
+            endpoints = seed_plan_endpoints(
+                options['recipes'], options['authors'],
+                random.Random(options['seed'])
+            )
+            try:
+                plans = get_query_plans(endpoints)
+            except QueryPlanError as error:
+                raise CommandError(error)
+        failed = self.check_plans(plans)
+        if failed:
+            raise CommandError(SEQ_SCANS_MSG.format(', '.join(failed)))
+        transaction.set_rollback(True)
@@ -0,0 +1,57 @@
+from django.core.management import BaseCommand, CommandError
+
+from recipes.importers import IMPORT_CHUNK_SIZE, RecipeImporter, report_line
+from users.models import User
+
+IMPORT_COMPLETE_MSG = 'Создано рецептов: {}, строк с ошибками: {}.'
+REPORT_MSG = 'Ошибки записаны в {}.'
+UNKNOWN_AUTHOR_MSG = 'Пользователь {} не найден.'
+
+
+class Command(BaseCommand):
+    """Команда для импорта рецептов из NDJSON."""
+
+    help = 'Импортирует рецепты из файла NDJSON пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON, по рецепту в строке.')
+        parser.add_argument(
+            '--author',
+            required=True,
+            help='Электронная почта автора импортируемых рецептов.'
+        )
+        parser.add_argument(
+            '--report',
+            help='Файл для ошибок строк, по умолчанию <path>.errors.ndjson.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='Количество строк в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(email=options['author']).first()
+        if author is None:
+            raise CommandError(UNKNOWN_AUTHOR_MSG.format(options['author']))
+        report_path = options['report'] or f'{options["path"]}.errors.ndjson'
+        try:
+            with open(options['path'], encoding='utf-8') as source, open(
+                report_path, 'w', encoding='utf-8'
+            ) as report:
+                importer = RecipeImporter(
+                    author,
+                    lambda number, error: report.write(
+                        report_line(number, error)
+                    ),
+                    options['chunk_size']
+                )
+                importer.run(source)
+        except OSError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            IMPORT_COMPLETE_MSG.format(importer.created, importer.failed)
+        ))
+        if importer.failed:
+            self.stdout.write(REPORT_MSG.format(report_path))
@@ -1,34 +1,138 @@
 import csv
+import io
+import json
 import os
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
 
+from recipes.cache import INGREDIENTS_VERSION_KEY, bump_version
 from recipes.models import Ingredient
 
-PROJECT_PATH = os.path.abspath(os.path.dirname(__name__))
-COMPLETE_LOAD_INGREDIENTS_MSG = 'Ингредиенты загружены.'
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+BATCH_SIZE = 1000
+NAME_MAX_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_MAX_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+COMPLETE_LOAD_INGREDIENTS_MSG = (
+    'Ингредиенты загружены: добавлено {}, уже были в базе {}, '
+    'пропущено некорректных строк {}.'
+)
+UNKNOWN_FORMAT_MSG = 'Поддерживаются только файлы .csv и .json: {}'
+LOAD_FAILED_MSG = 'Не удалось загрузить ингредиенты: {}'
+
+STAGING_SQL = '''
+    CREATE TEMPORARY TABLE ingredient_staging (
+        name varchar({name_length}),
+        measurement_unit varchar({unit_length})
+    ) ON COMMIT DROP
+'''.format(name_length=NAME_MAX_LENGTH, unit_length=UNIT_MAX_LENGTH)
+COPY_SQL = '''
+    COPY ingredient_staging (name, measurement_unit)
+    FROM STDIN WITH (FORMAT csv)
+'''
+MERGE_SQL = '''
+    INSERT INTO {table} (name, measurement_unit)
+    SELECT DISTINCT name, measurement_unit FROM ingredient_staging
+    ON CONFLICT (name, measurement_unit) DO NOTHING
+'''.format(table=Ingredient._meta.db_table)
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        yield row[:2] if len(row) >= 2 else (None, None)
+
+
+def read_json(file):
+    for item in json.load(file):
+        if isinstance(item, dict):
+            yield item.get('name'), item.get('measurement_unit')
+        else:
+            yield None, None
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
 
 
 class Command(BaseCommand):
-    """Команда для загрузки ингредиентов."""
+    """Команда для загрузки ингредиентов.
+
+    Повторная загрузка не создает дублей: ингредиенты с теми же
+    названием и единицей измерения пропускаются.
+    """
 
-    def handle(self, *args, **kwargs):
+    help = 'Загружает ингредиенты из CSV или JSON без дублей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=str(DEFAULT_PATH),
+            help='Файл .csv (название, единица) или .json со списком '
+                 'объектов name/measurement_unit.'
+        )
+
+    def read_rows(self, path):
+        """Читает файл и возвращает уникальные корректные строки."""
+
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(UNKNOWN_FORMAT_MSG.format(path))
+        rows = {}
+        invalid = 0
+        with open(path, encoding='utf-8') as file:
+            for name, unit in reader(file):
+                if not isinstance(name, str) or not isinstance(unit, str):
+                    invalid += 1
+                    continue
+                name, unit = name.strip(), unit.strip()
+                if not name or not unit or len(name) > NAME_MAX_LENGTH or (
+                    len(unit) > UNIT_MAX_LENGTH
+                ):
+                    invalid += 1
+                    continue
+                rows[(name, unit)] = None
+        return list(rows), invalid
+
+    def copy_rows(self, rows):
+        """Загружает строки через COPY во временную таблицу и сливает их."""
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(STAGING_SQL)
+            cursor.copy_expert(COPY_SQL, buffer)
+            cursor.execute(MERGE_SQL)
+            return cursor.rowcount
+
+    def bulk_create_rows(self, rows):
+        count = Ingredient.objects.count()
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=unit)
+             for name, unit in rows),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        return Ingredient.objects.count() - count
+
+    def handle(self, *args, **options):
         try:
-            with open(
-                f'{PROJECT_PATH}/../data/ingredients.csv',
-                'r',
-                encoding='utf-8'
-            ) as file:
-                reader = csv.reader(file)
-                Ingredient.objects.bulk_create(
-                    Ingredient(
-                        name=line[0],
-                        measurement_unit=line[1]
-                    ) for line in reader
-                )
-        except Exception as error:
-            self.stdout.write(self.style.ERROR(error))
-        else:
-            self.stdout.write(
-                self.style.SUCCESS(COMPLETE_LOAD_INGREDIENTS_MSG)
+            rows, invalid = self.read_rows(options['path'])
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    inserted = self.copy_rows(rows)
+                else:
+                    inserted = self.bulk_create_rows(rows)
+        except (OSError, ValueError, csv.Error, DatabaseError) as error:
+            raise CommandError(LOAD_FAILED_MSG.format(error))
+        if inserted:
+            bump_version(INGREDIENTS_VERSION_KEY)
+        self.stdout.write(self.style.SUCCESS(
+            COMPLETE_LOAD_INGREDIENTS_MSG.format(
+                inserted, len(rows) - inserted, invalid
             )
+        ))
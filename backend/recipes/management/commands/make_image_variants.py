@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+
+from recipes.images import refresh_image_variants
+from recipes.models import Recipe
+
+COMPLETE_MSG = 'Копии картинок созданы для рецептов: {}.'
+
+
+class Command(BaseCommand):
+    """Команда для создания копий картинок уже загруженных рецептов."""
+
+    help = 'Создает уменьшенные копии и WebP-версии картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии даже для обработанных картинок.'
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        for recipe in Recipe.objects.only(
+            'id', 'image', 'image_variants'
+        ).iterator():
+            processed += refresh_image_variants(
+                recipe, force=options['force']
+            )
+        self.stdout.write(self.style.SUCCESS(COMPLETE_MSG.format(processed)))
@@ -0,0 +1,67 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import IngredientRecipe, ShoppingListItem, User
+
+REBUILD_COMPLETE_MSG = 'Списки покупок пересобраны: {} строк.'
+VERIFY_COMPLETE_MSG = 'Списки покупок совпадают с корзинами.'
+VERIFY_FAILED_MSG = 'Расхождений в списках покупок: {}.'
+MISMATCH_MSG = 'user={} ingredient={}: в таблице {}, в корзине {}'
+
+
+class Command(BaseCommand):
+    """Команда для пересборки и проверки сводных списков покупок."""
+
+    help = 'Пересобирает или проверяет сводные списки покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить таблицу с корзинами, ничего не меняя.'
+        )
+
+    def expected_totals(self):
+        """Суммы ингредиентов, посчитанные по корзинам с нуля."""
+
+        return {
+            (total['recipe__shop_cart__user'], total['ingredient']):
+                total['total_amount']
+            for total in IngredientRecipe.objects.filter(
+                recipe__shop_cart__isnull=False
+            ).values('recipe__shop_cart__user', 'ingredient').annotate(
+                total_amount=Sum('amount')
+            ).order_by().iterator()
+        }
+
+    def verify(self):
+        expected = self.expected_totals()
+        stored = {
+            (item['user'], item['ingredient']): item['total_amount']
+            for item in ShoppingListItem.objects.values(
+                'user', 'ingredient', 'total_amount'
+            ).order_by().iterator()
+        }
+        mismatches = 0
+        for key in expected.keys() | stored.keys():
+            if expected.get(key) != stored.get(key):
+                mismatches += 1
+                self.stdout.write(MISMATCH_MSG.format(
+                    *key, stored.get(key), expected.get(key)
+                ))
+        if mismatches:
+            raise CommandError(VERIFY_FAILED_MSG.format(mismatches))
+        self.stdout.write(self.style.SUCCESS(VERIFY_COMPLETE_MSG))
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify()
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.refresh(
+                User.objects.filter(shop_cart__isnull=False)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            REBUILD_COMPLETE_MSG.format(ShoppingListItem.objects.count())
+        ))
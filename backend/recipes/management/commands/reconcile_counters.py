@@ -0,0 +1,45 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import COUNTERS, actual_count
+
+DRIFT_MSG = '{}.{}: расхождений {}.'
+RECONCILE_COMPLETE_MSG = 'Счетчики сверены, исправлено записей: {}.'
+VERIFY_FAILED_MSG = 'Счетчики расходятся в {} записях.'
+
+
+class Command(BaseCommand):
+    """Команда для сверки счетчиков избранного, рецептов и подписчиков."""
+
+    help = 'Пересчитывает денормализованные счетчики, если они разошлись.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только найти расхождения, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for child, key, model, field in COUNTERS:
+            with transaction.atomic():
+                drift = model.objects.annotate(
+                    actual=actual_count(child, key)
+                ).exclude(**{field: F('actual')}).values('pk')
+                count = drift.count()
+                if count and not options['verify']:
+                    model.objects.filter(pk__in=drift).update(
+                        **{field: actual_count(child, key)}
+                    )
+            if count:
+                self.stdout.write(DRIFT_MSG.format(
+                    model.__name__, field, count
+                ))
+            total += count
+        if options['verify'] and total:
+            raise CommandError(VERIFY_FAILED_MSG.format(total))
+        self.stdout.write(self.style.SUCCESS(
+            RECONCILE_COMPLETE_MSG.format(0 if options['verify'] else total)
+        ))
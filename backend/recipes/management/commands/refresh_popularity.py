@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+
+from recipes.popularity import refresh_popularity
+
+REFRESH_COMPLETE_MSG = 'Популярность пересчитана, учтено добавлений: {}.'
+
+
+class Command(BaseCommand):
+    """Команда для пересчета популярности рецептов."""
+
+    help = (
+        'Пересчитывает популярность рецептов, которые с прошлого '
+        'пересчета добавляли или удаляли из избранного и покупок. '
+        'Запускается периодически, например из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать популярность с нуля по всем добавлениям.'
+        )
+
+    def handle(self, *args, **options):
+        events = refresh_popularity(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            REFRESH_COMPLETE_MSG.format(events)
+        ))
@@ -0,0 +1,23 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppinglistitem'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            'CREATE INDEX recipes_ingredient_lower_name_idx '
+            'ON recipes_ingredient (lower(name) text_pattern_ops);',
+            'DROP INDEX recipes_ingredient_lower_name_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX recipes_ingredient_name_trgm_idx '
+            'ON recipes_ingredient USING gin (lower(name) gin_trgm_ops);',
+            'DROP INDEX recipes_ingredient_name_trgm_idx;',
+        ),
+    ]
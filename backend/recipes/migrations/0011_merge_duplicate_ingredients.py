@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:18
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        extra_ids = list(Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        IngredientRecipe.objects.filter(
+            ingredient_id__in=extra_ids
+        ).update(ingredient_id=keep_id)
+        for item in ShoppingListItem.objects.filter(
+            ingredient_id__in=extra_ids
+        ):
+            updated = ShoppingListItem.objects.filter(
+                user_id=item.user_id, ingredient_id=keep_id
+            ).update(total_amount=models.F('total_amount') + item.total_amount)
+            if updated:
+                item.delete()
+            else:
+                item.ingredient_id = keep_id
+                item.save(update_fields=('ingredient',))
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
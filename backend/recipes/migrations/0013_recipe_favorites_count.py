@@ -0,0 +1,30 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_favorites(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavoriteRecipe = apps.get_model('recipes', 'FavoriteRecipe')
+    Recipe.objects.update(favorites_count=Coalesce(models.Subquery(
+        FavoriteRecipe.objects.filter(recipe=models.OuterRef('pk')).values(
+            'recipe'
+        ).annotate(total=models.Count('id')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_unique_name_unit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлен в избранное'),
+        ),
+        migrations.RunPython(count_favorites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tagsrecipe',
+            index=models.Index(fields=['tag', 'recipe'], name='tagsrecipe_tag_recipe_idx'),
+        ),
+        migrations.AlterField(
+            model_name='tagsrecipe',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.tag', verbose_name='Тег'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:40
+
+from django.db import migrations, models
+
+MAX_AMOUNT = 32_000
+
+
+def merge_duplicate_recipe_links(apps, schema_editor):
+    TagsRecipe = apps.get_model('recipes', 'TagsRecipe')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = TagsRecipe.objects.values('recipe', 'tag').annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        TagsRecipe.objects.filter(
+            recipe_id=duplicate['recipe'], tag_id=duplicate['tag']
+        ).exclude(id=duplicate['keep_id']).delete()
+    duplicates = IngredientRecipe.objects.values(
+        'recipe', 'ingredient'
+    ).annotate(
+        keep_id=models.Min('id'),
+        total=models.Count('id'),
+        amount=models.Sum('amount')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        IngredientRecipe.objects.filter(
+            recipe_id=duplicate['recipe'],
+            ingredient_id=duplicate['ingredient']
+        ).exclude(id=duplicate['keep_id']).delete()
+        IngredientRecipe.objects.filter(id=duplicate['keep_id']).update(
+            amount=min(duplicate['amount'], MAX_AMOUNT)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_tagsrecipe_tag_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_recipe_links, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-17 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0019_recipe_link_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityRemoval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.PositiveIntegerField(verbose_name='Рецепт')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удаление для пересчета популярности',
+                'verbose_name_plural': 'Удаления для пересчета популярности',
+            },
+        ),
+    ]
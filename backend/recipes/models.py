@@ -1,7 +1,12 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db.models import (CASCADE, CharField, DateTimeField, ForeignKey,
-                              ImageField, ManyToManyField, Model,
-                              PositiveSmallIntegerField, SlugField, TextField,
+from django.db import transaction
+from django.db.models import (CASCADE, CharField, DateTimeField, FloatField,
+                              ForeignKey, ImageField, Index, JSONField,
+                              Manager, ManyToManyField, Model, OneToOneField,
+                              PositiveIntegerField, PositiveSmallIntegerField,
+                              QuerySet, SlugField, Sum, TextField,
                               UniqueConstraint)
 
 from users.models import User
@@ -53,6 +58,12 @@ class Ingredient(Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit'
+            )
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -75,6 +86,12 @@ class Recipe(Model):
         verbose_name='Картинка',
         upload_to='recipes/',
     )
+    image_variants = JSONField(
+        verbose_name='Копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     description = TextField(
         verbose_name='Описание рецепта',
     )
@@ -105,11 +122,31 @@ class Recipe(Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
     )
+    updated_at = DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = PositiveIntegerField(
+        verbose_name='Добавлен в избранное',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+            GinIndex(
+                fields=['search_vector'], name='recipe_search_vector_idx'
+            ),
+        ]
         constraints = [
             UniqueConstraint(
                 fields=['author', 'name'],
@@ -134,6 +171,11 @@ class FavoritesShopCart(Model):
         verbose_name='Рецепт',
         on_delete=CASCADE
     )
+    created = DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         abstract = True
@@ -183,18 +225,28 @@ class TagsRecipe(Model):
     tag = ForeignKey(
         Tag,
         verbose_name='Тег',
-        on_delete=CASCADE
+        on_delete=CASCADE,
+        db_index=False
     )
     recipe = ForeignKey(
         Recipe,
         verbose_name='Рецепт',
-        on_delete=CASCADE
+        on_delete=CASCADE,
+        db_index=False
     )
 
     class Meta:
         verbose_name = 'Тег рецепта'
         verbose_name_plural = 'Теги рецепта'
-        ordering = ('recipe__name',)
+        indexes = [
+            Index(fields=['tag', 'recipe'], name='tagsrecipe_tag_recipe_idx'),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=['recipe', 'tag'],
+                name='unique_recipe_tag'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'{self.tag}'
@@ -213,7 +265,8 @@ class IngredientRecipe(Model):
         Recipe,
         verbose_name='Рецепт',
         on_delete=CASCADE,
-        related_name='recipe'
+        related_name='recipe',
+        db_index=False
     )
     amount = PositiveSmallIntegerField(
         verbose_name='Количество',
@@ -232,7 +285,203 @@ class IngredientRecipe(Model):
     class Meta:
         verbose_name = 'Ингридиент в рецепте'
         verbose_name_plural = 'Ингридиенты в рецепте'
-        ordering = ('ingredient__name',)
+        constraints = [
+            UniqueConstraint(
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'{self.ingredient} в {self.recipe}: {self.amount}'
+
+
+class ShoppingListItemManager(Manager):
+    """Менеджер сводного списка покупок."""
+
+    @transaction.atomic
+    def refresh(self, users, ingredients=None):
+        """Пересчитывает суммы ингредиентов в списках покупок.
+
+        Пересчитываются только строки переданных пользователей
+        и, если они заданы, ингредиентов. Строки пользователей
+        блокируются до пересчета, поэтому параллельные пересчеты одного
+        списка выполняются по очереди.
+        """
+
+        if not isinstance(users, QuerySet):
+            users = [getattr(user, 'pk', user) for user in users]
+        users = list(User.objects.select_for_update().filter(
+            pk__in=users
+        ).order_by('pk').values_list('pk', flat=True))
+        if not users:
+            return
+        items = self.filter(user__in=users)
+        totals = IngredientRecipe.objects.filter(
+            recipe__shop_cart__user__in=users
+        )
+        if ingredients is not None:
+            items = items.filter(ingredient__in=ingredients)
+            totals = totals.filter(ingredient__in=ingredients)
+        items.delete()
+        self.bulk_create(
+            self.model(
+                user_id=total['recipe__shop_cart__user'],
+                ingredient_id=total['ingredient'],
+                total_amount=total['total_amount']
+            ) for total in totals.values(
+                'recipe__shop_cart__user', 'ingredient'
+            ).annotate(total_amount=Sum('amount')).order_by()
+        )
+
+
+class ShoppingListItem(Model):
+    """Модель сводного списка покупок пользователя."""
+
+    user = ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=CASCADE,
+        related_name='shopping_list'
+    )
+    total_amount = PositiveIntegerField(
+        verbose_name='Общее количество',
+    )
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Сводный список покупок'
+        ordering = ('user', 'ingredient__name')
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.ingredient}: {self.total_amount}'
+
+
+class RecipePopularity(Model):
+    """Модель популярности рецепта.
+
+    score — логарифм суммы затухающих весов добавлений в избранное
+    и в покупки, приведенных к общей точке отсчета, поэтому порядок
+    рецептов по нему не меняется со временем и строки не нужно
+    пересчитывать, пока нет новых добавлений.
+    """
+
+    recipe = OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name='popularity'
+    )
+    score = FloatField(
+        verbose_name='Популярность'
+    )
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = [
+            Index(fields=['-score'], name='recipe_popularity_score_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id}: {self.score}'
+
+
+class PopularityRefresh(Model):
+    """Модель запуска пересчета популярности."""
+
+    until = DateTimeField(
+        verbose_name='Учтены добавления до'
+    )
+    events = PositiveIntegerField(
+        verbose_name='Учтено добавлений'
+    )
+    created = DateTimeField(
+        verbose_name='Дата пересчета',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Пересчет популярности'
+        verbose_name_plural = 'Пересчеты популярности'
+        ordering = ('-until',)
+
+    def __str__(self) -> str:
+        return f'{self.until}: {self.events}'
+
+
+class PopularityRemoval(Model):
+    """Модель удаления из избранного или покупок до пересчета популярности.
+
+    Ссылки на рецепт нет: отметки пишутся и при каскадном удалении
+    рецепта.
+    """
+
+    recipe_id = PositiveIntegerField(
+        verbose_name='Рецепт'
+    )
+    created = DateTimeField(
+        verbose_name='Дата удаления',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Удаление для пересчета популярности'
+        verbose_name_plural = 'Удаления для пересчета популярности'
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id}: {self.created}'
+
+
+class TimelineEntry(Model):
+    """Модель ленты подписок: рецепт автора в ленте подписчика."""
+
+    user = ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=CASCADE,
+        related_name='timeline'
+    )
+    recipe = ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        indexes = [
+            Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id} в ленте {self.user_id}'
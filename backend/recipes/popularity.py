@@ -0,0 +1,111 @@
+import math
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import (FavoriteRecipe, PopularityRefresh,
+                            PopularityRemoval, Recipe, RecipePopularity,
+                            ShoppingCart)
+
+POPULARITY_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+POPULARITY_HALF_LIFE = timedelta(days=7)
+POPULARITY_LAG = timedelta(minutes=1)
+POPULARITY_WEIGHTS = (
+    (FavoriteRecipe, 1.0),
+    (ShoppingCart, 0.5),
+)
+DECAY_RATE = math.log(2) / POPULARITY_HALF_LIFE.total_seconds()
+
+
+def log_add(first, second):
+    """Логарифм суммы exp(first) + exp(second) без переполнения."""
+
+    if first < second:
+        first, second = second, first
+    return first + math.log1p(math.exp(second - first))
+
+
+def event_score(created, weight):
+    """Логарифм веса добавления, приведенного к POPULARITY_EPOCH.
+
+    Вес добавления сейчас равен weight * 2 ** (-возраст / полураспад),
+    у всех рецептов он делится на одно и то же число, поэтому
+    сравнивать можно веса, отсчитанные от общей эпохи.
+    """
+
+    return math.log(weight) + DECAY_RATE * (
+        created - POPULARITY_EPOCH
+    ).total_seconds()
+
+
+def changed_recipes(since, until):
+    """Рецепты с добавлениями в избранное или в покупки за период."""
+
+    recipe_ids = set()
+    for model, _ in POPULARITY_WEIGHTS:
+        recipe_ids.update(model.objects.filter(
+            created__gt=since, created__lte=until
+        ).values_list('recipe_id', flat=True).order_by())
+    return recipe_ids
+
+
+def collect_scores(until, recipe_ids=None):
+    """Суммирует веса всех добавлений до until по рецептам."""
+
+    scores = {}
+    events = 0
+    for model, weight in POPULARITY_WEIGHTS:
+        queryset = model.objects.filter(created__lte=until)
+        if recipe_ids is not None:
+            queryset = queryset.filter(recipe_id__in=recipe_ids)
+        for recipe_id, created in queryset.values_list(
+            'recipe_id', 'created'
+        ).order_by().iterator():
+            score = event_score(created, weight)
+            scores[recipe_id] = (
+                log_add(scores[recipe_id], score)
+                if recipe_id in scores else score
+            )
+            events += 1
+    return scores, events
+
+
+@transaction.atomic
+def refresh_popularity(full=False):
+    """Пересчитывает популярность рецептов с новыми событиями.
+
+    Учитываются добавления до now - LAG, чтобы не пропустить записи
+    еще не завершенных транзакций. Рецепты с добавлениями после
+    прошлого пересчета и с удалениями из избранного или покупок
+    пересчитываются заново по всем своим добавлениям, поэтому
+    удаление снижает популярность, а повторное добавление не
+    завышает ее. Параллельный запуск ждет завершения текущего.
+    Возвращает число учтенных добавлений.
+    """
+
+    if PopularityRefresh.objects.select_for_update().first() is not None:
+        # После ожидания блокировки читается пересчет, добавленный
+        # параллельным запуском.
+        last_refresh = PopularityRefresh.objects.first()
+    else:
+        full = True
+    until = timezone.now() - POPULARITY_LAG
+    removals = dict(PopularityRemoval.objects.values_list('id', 'recipe_id'))
+    recipe_ids = None
+    popularity = RecipePopularity.objects.all()
+    if not full:
+        recipe_ids = changed_recipes(last_refresh.until, until)
+        recipe_ids.update(removals.values())
+        popularity = popularity.filter(recipe_id__in=recipe_ids)
+    scores, events = collect_scores(until, recipe_ids)
+    popularity.delete()
+    RecipePopularity.objects.bulk_create(
+        RecipePopularity(recipe_id=recipe_id, score=scores[recipe_id])
+        for recipe_id in Recipe.objects.filter(
+            pk__in=scores.keys()
+        ).values_list('pk', flat=True)
+    )
+    PopularityRemoval.objects.filter(id__in=removals.keys()).delete()
+    PopularityRefresh.objects.create(until=until, events=events)
+    return events
@@ -0,0 +1,144 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Tag
+from recipes.seeding import (SEED_TAG_SLUG, seed_activity, seed_catalog,
+                             seed_popularity, seed_user)
+
+SEQ_SCAN_RE = re.compile(r'Seq Scan on (\w+)')
+SELECT_RE = re.compile(
+    r'^\s*(?:DECLARE .+? CURSOR .+? FOR )?(SELECT .+)$', re.DOTALL
+)
+INDEX_RE = re.compile(
+    r'(?:Index Scan|Index Only Scan)(?: Backward)? using (\w+)'
+    r'|Bitmap Index Scan on (\w+)'
+)
+STATUS_MSG = '{}: ответ {}'
+EXPECTED_INDEXES = {
+    'recipes': 'recipe_pub_date_id_idx',
+    'recipes_cursor': 'recipe_pub_date_id_idx',
+    'recipes_by_tags': 'tagsrecipe_tag_recipe_idx',
+    'recipes_search': 'recipe_search_vector_idx',
+    'popular': 'recipe_popularity_score_idx',
+    'feed': 'timeline_user_pub_date_idx',
+}
+
+
+class QueryPlanError(Exception):
+    """Запрос API для проверки планов вернул ответ с ошибкой."""
+
+
+def seed_plan_endpoints(recipes, authors, generator):
+    """Заполняет базу и возвращает основные запросы API с клиентами.
+
+    Словарь: имя запроса → (клиент, адрес).
+    """
+
+    authors = [seed_catalog(recipes, generator) for _ in range(authors)]
+    user = seed_user()
+    seed_activity(user, authors, generator)
+    seed_popularity(generator)
+    client, newcomer = APIClient(), APIClient()
+    client.force_authenticate(user)
+    newcomer.force_authenticate(seed_user())
+    recipe = authors[0].recipes.first()
+    slugs = '&'.join(
+        f'tags={slug}' for slug in Tag.objects.filter(
+            slug__startswith=SEED_TAG_SLUG.format('')
+        ).values_list('slug', flat=True)[:2]
+    )
+    endpoints = {
+        'recipes': '/api/recipes/',
+        'recipes_cursor': '/api/recipes/?pagination=cursor',
+        'recipes_by_author': f'/api/recipes/?author={authors[0].pk}',
+        'recipes_by_tags': f'/api/recipes/?{slugs}',
+        'recipes_favorited': '/api/recipes/?is_favorited=1',
+        'recipes_in_cart': '/api/recipes/?is_in_shopping_cart=1',
+        'recipes_search': f'/api/recipes/?search={recipe.name}',
+        'recipe': f'/api/recipes/{recipe.pk}/',
+        'popular': '/api/recipes/popular/',
+        'feed': '/api/recipes/feed/',
+        'shopping_cart': '/api/recipes/download_shopping_cart/',
+        'users': '/api/users/',
+        'user': f'/api/users/{authors[0].pk}/',
+        'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+    }
+    endpoints = {name: (client, url) for name, url in endpoints.items()}
+    endpoints['subscriptions_empty'] = (
+        newcomer, '/api/users/subscriptions/?recipes_limit=3'
+    )
+    return endpoints
+
+
+def request(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if response.status_code != 200:
+        raise QueryPlanError(STATUS_MSG.format(url, response.status_code))
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}')
+        return '\n'.join(row[0] for row in cursor.fetchall())
+
+
+def get_query_plans(endpoints):
+    """Планы SELECT-запросов, которые выполняют запросы API.
+
+    Каждый запрос сначала выполняется для прогрева кешей. Возвращает
+    словарь: имя запроса → список пар (sql, план). Последовательное
+    чтение выключено до конца транзакции, поэтому Seq Scan в плане
+    означает, что подходящего индекса нет.
+    """
+
+    for client, url in endpoints.values():
+        request(client, url)
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    plans = {}
+    for name, (client, url) in endpoints.items():
+        with CaptureQueriesContext(connection) as queries:
+            request(client, url)
+        plans[name] = [
+            (match.group(1), explain(match.group(1))) for match in (
+                SELECT_RE.match(query['sql'])
+                for query in queries.captured_queries
+            ) if match
+        ]
+    return plans
+
+
+def seq_scans(plans):
+    """Таблицы, которые планы читают целиком."""
+
+    return sorted({
+        table for _, plan in plans for table in SEQ_SCAN_RE.findall(plan)
+    })
+
+
+def used_indexes(plans):
+    """Индексы, которые читают планы."""
+
+    return {
+        scan or bitmap_scan
+        for _, plan in plans for scan, bitmap_scan in INDEX_RE.findall(plan)
+    }
+
+
+def missing_index(name, plans):
+    """Ожидаемый индекс запроса API, если планы его не используют.
+
+    Без последовательного чтения планировщик все равно найдет
+    какой-нибудь индекс, поэтому для основных запросов проверяется
+    именно тот, что был создан под них.
+    """
+
+    index = EXPECTED_INDEXES.get(name)
+    if index is None or index in used_indexes(plans):
+        return None
+    return index
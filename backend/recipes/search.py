@@ -0,0 +1,207 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import timedelta
+from threading import Lock
+
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from recipes.cache import (CATALOG_VERSION_KEY, INGREDIENTS_VERSION_KEY,
+                           get_version, ingredients_cache)
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+MAX_CHAR = chr(0x10FFFF)
+PREFIX_MATCH = 0
+SUBSTRING_MATCH = 1
+MAX_MISSING_INGREDIENTS = 2
+RECIPE_INDEX_SLACK = timedelta(minutes=1)
+
+
+class IngredientPrefixIndex:
+    """Индекс ингредиентов в памяти процесса для поиска по началу названия.
+
+    Названия хранятся в отсортированном списке в нижнем регистре,
+    поиск выполняется бинарным поиском. Индекс строится по копии
+    ингредиентов из ingredients_cache и перестраивается вместе с ней.
+    """
+
+    def __init__(self):
+        self._index = (None, [], [])
+        self._lock = Lock()
+
+    def _get_index(self, source):
+        if self._index[0] is not source:
+            with self._lock:
+                if self._index[0] is not source:
+                    ingredients = sorted(
+                        source.values(),
+                        key=lambda ingredient: ingredient.name.casefold()
+                    )
+                    self._index = (
+                        source,
+                        [ingredient.name.casefold()
+                         for ingredient in ingredients],
+                        ingredients
+                    )
+        return self._index
+
+    def search(self, prefix, source=None):
+        """Возвращает ингредиенты, название которых начинается с prefix.
+
+        source - уже прочитанная копия ingredients_cache, по умолчанию
+        она берется из кеша.
+        """
+
+        if source is None:
+            source = ingredients_cache.get_objects()
+        _, names, ingredients = self._get_index(source)
+        prefix = prefix.casefold()
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix + MAX_CHAR, start)
+        return ingredients[start:end]
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+def ranked_ingredient_search(name):
+    """Ищет ингредиенты по вхождению в название одним запросом.
+
+    Сначала идут совпадения по началу названия, затем остальные.
+    Оба условия используют индексы по lower(name) из миграций.
+    """
+
+    name = name.lower()
+    return Ingredient.objects.annotate(
+        lower_name=Lower('name')
+    ).filter(lower_name__contains=name).annotate(
+        match=Case(
+            When(lower_name__startswith=name, then=Value(PREFIX_MATCH)),
+            default=Value(SUBSTRING_MATCH),
+            output_field=IntegerField()
+        )
+    ).order_by('match', 'name')
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Когда любой процесс меняет версию каталога, индекс дочитывает
+    только рецепты, измененные после прошлой синхронизации (с запасом
+    RECIPE_INDEX_SLACK на незавершенные транзакции). Изменение
+    справочника ингредиентов перестраивает индекс целиком.
+    Множества рецептов заменяются новыми, а не меняются на месте,
+    поэтому поиск в других потоках идет без блокировки.
+    """
+
+    def __init__(self):
+        self._versions = None
+        self._synced_at = None
+        self._postings = {}
+        self._recipes = {}
+        self._lock = Lock()
+
+    def _rebuild(self):
+        recipes = {
+            recipe_id: set() for recipe_id in Recipe.objects.values_list(
+                'id', flat=True
+            ).order_by().iterator()
+        }
+        postings = defaultdict(set)
+        for recipe_id, ingredient_id in IngredientRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by().iterator():
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+            postings[ingredient_id].add(recipe_id)
+        self._recipes = {
+            recipe_id: frozenset(ingredients)
+            for recipe_id, ingredients in recipes.items()
+        }
+        self._postings = {
+            ingredient_id: frozenset(recipe_ids)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+
+    def _replace(self, changed):
+        """Заменяет состав рецептов; None удаляет рецепт из индекса."""
+
+        added = defaultdict(set)
+        removed = defaultdict(set)
+        for recipe_id, ingredients in changed.items():
+            old = self._recipes.get(recipe_id, frozenset())
+            new = ingredients or frozenset()
+            for ingredient_id in old - new:
+                removed[ingredient_id].add(recipe_id)
+            for ingredient_id in new - old:
+                added[ingredient_id].add(recipe_id)
+        for ingredient_id in added.keys() | removed.keys():
+            self._postings[ingredient_id] = (
+                self._postings.get(ingredient_id, frozenset())
+                - removed[ingredient_id]
+            ) | added[ingredient_id]
+        for recipe_id, ingredients in changed.items():
+            if ingredients is None:
+                self._recipes.pop(recipe_id, None)
+            else:
+                self._recipes[recipe_id] = frozenset(ingredients)
+
+    def _update(self, since):
+        changed = {
+            recipe_id: set() for recipe_id in Recipe.objects.filter(
+                updated_at__gt=since - RECIPE_INDEX_SLACK
+            ).values_list('id', flat=True).order_by()
+        }
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in=list(changed)
+        ).values_list('recipe_id', 'ingredient_id').order_by():
+            changed[recipe_id].add(ingredient_id)
+        self._replace(changed)
+        if Recipe.objects.count() != len(self._recipes):
+            existing = set(Recipe.objects.values_list('id', flat=True))
+            self._replace({
+                recipe_id: None for recipe_id in self._recipes
+                if recipe_id not in existing
+            })
+
+    def _sync(self):
+        versions = (
+            get_version(CATALOG_VERSION_KEY),
+            get_version(INGREDIENTS_VERSION_KEY)
+        )
+        if self._versions == versions:
+            return
+        with self._lock:
+            if self._versions == versions:
+                return
+            started = timezone.now()
+            if self._versions is None or self._versions[1] != versions[1]:
+                self._rebuild()
+            else:
+                self._update(self._synced_at)
+            self._synced_at = started
+            self._versions = versions
+
+    def search(self, ingredient_ids, max_missing=MAX_MISSING_INGREDIENTS):
+        """Рецепты, которым не хватает не больше max_missing ингредиентов.
+
+        Возвращает список пар (id рецепта, число недостающих), сначала
+        полностью покрытые рецепты, затем с большим числом совпадений
+        и более новые.
+        """
+
+        self._sync()
+        hits = Counter()
+        for ingredient_id in set(ingredient_ids):
+            hits.update(self._postings.get(ingredient_id, ()))
+        recipes = self._recipes
+        ranked = []
+        for recipe_id, matched in hits.items():
+            missing = len(recipes.get(recipe_id, ())) - matched
+            if 0 <= missing <= max_missing:
+                ranked.append((missing, -matched, -recipe_id))
+        ranked.sort()
+        return [(-recipe_id, missing) for missing, _, recipe_id in ranked]
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
@@ -0,0 +1,176 @@
+import uuid
+from itertools import islice
+
+from django.db import connection, transaction
+
+from recipes.counters import change_counter
+from recipes.images import get_placeholder_image
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
+                            Recipe, RecipePopularity, ShoppingCart,
+                            ShoppingListItem, Tag, TagsRecipe, TimelineEntry)
+from recipes.timeline import backfill_timeline
+from users.models import Subscription, User
+
+SEED_CHUNK_SIZE = 1000
+SEED_INGREDIENTS = 500
+SEED_TAGS = 3
+SEED_MEASUREMENT_UNIT = 'г'
+SEED_INGREDIENT_NAME = 'Синтетический ингредиент {}'
+SEED_TAG_NAME = 'Синтетический тег {}'
+SEED_TAG_SLUG = 'seed-{}'
+SEED_TAG_COLOR = '#5EED{:02X}'
+
+
+def seed_ingredients():
+    """Возвращает id синтетических ингредиентов, создавая их один раз.
+
+    Ингредиенты из базы не используются, поэтому каталог одинаков
+    в пустой базе и в базе с загруженным справочником.
+    """
+
+    ids = list(Ingredient.objects.filter(
+        name__startswith=SEED_INGREDIENT_NAME.format(''),
+        measurement_unit=SEED_MEASUREMENT_UNIT
+    ).order_by('id').values_list('id', flat=True))
+    if ids:
+        return ids
+    return [ingredient.pk for ingredient in Ingredient.objects.bulk_create(
+        Ingredient(
+            name=SEED_INGREDIENT_NAME.format(number),
+            measurement_unit=SEED_MEASUREMENT_UNIT
+        ) for number in range(SEED_INGREDIENTS)
+    )]
+
+
+def seed_tags():
+    """Возвращает id синтетических тегов, создавая их один раз."""
+
+    ids = list(Tag.objects.filter(
+        slug__startswith=SEED_TAG_SLUG.format('')
+    ).order_by('id').values_list('id', flat=True))
+    if ids:
+        return ids
+    return [tag.pk for tag in Tag.objects.bulk_create(
+        Tag(
+            name=SEED_TAG_NAME.format(number),
+            color=SEED_TAG_COLOR.format(number),
+            slug=SEED_TAG_SLUG.format(number)
+        ) for number in range(SEED_TAGS)
+    )]
+
+
+def analyze(*models):
+    """Обновляет статистику планировщика после массовой вставки."""
+
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+def seed_user():
+    """Создает синтетического пользователя."""
+
+    name = f'seed-{uuid.uuid4().hex[:12]}'
+    return User.objects.create(
+        username=name,
+        email=f'{name}@example.com',
+        first_name=name,
+        last_name=name
+    )
+
+
+@transaction.atomic
+def seed_catalog(size, generator, ingredients_per_recipe=(5, 12),
+                 tags_per_recipe=(1, 2), author=None):
+    """Создает size синтетических рецептов одного автора.
+
+    Рецепты и связи пишутся пачками через bulk_create, без сигналов:
+    очередь задач, ленты и кеши не затрагиваются. Возвращает автора.
+    """
+
+    ingredients = seed_ingredients()
+    tags = seed_tags()
+    author = author or seed_user()
+    image = get_placeholder_image()
+    numbers = iter(range(size))
+    while chunk := list(islice(numbers, SEED_CHUNK_SIZE)):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'Рецепт {author.username} {number}',
+                description=f'Синтетический рецепт {number}',
+                cooking_time=generator.randint(1, 180),
+                image=image
+            ) for number in chunk
+        )
+        TagsRecipe.objects.bulk_create(
+            TagsRecipe(recipe=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in generator.sample(
+                tags, min(generator.randint(*tags_per_recipe), len(tags))
+            )
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient,
+                amount=generator.randint(1, 500)
+            )
+            for recipe in recipes
+            for ingredient in generator.sample(
+                ingredients,
+                min(generator.randint(*ingredients_per_recipe),
+                    len(ingredients))
+            )
+        )
+    change_counter(User, author.pk, 'recipes_count', size)
+    analyze(Recipe, TagsRecipe, IngredientRecipe)
+    return author
+
+
+@transaction.atomic
+def seed_activity(user, authors, generator, favorites=50, cart=10):
+    """Подписывает пользователя на авторов и наполняет его списки.
+
+    Рецепты для избранного и покупок выбираются среди рецептов
+    авторов, лента заполняется так же, как при подписке.
+    """
+
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author) for author in authors
+    )
+    for author in authors:
+        change_counter(User, author.pk, 'followers_count', 1)
+        author.followers_count += 1
+    recipes = list(Recipe.objects.filter(author__in=authors).values_list(
+        'id', flat=True
+    ))
+    favorite_ids = generator.sample(recipes, min(favorites, len(recipes)))
+    FavoriteRecipe.objects.bulk_create(
+        FavoriteRecipe(user=user, recipe_id=recipe_id)
+        for recipe_id in favorite_ids
+    )
+    for recipe_id in favorite_ids:
+        change_counter(Recipe, recipe_id, 'favorites_count', 1)
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe_id=recipe_id)
+        for recipe_id in generator.sample(recipes, min(cart, len(recipes)))
+    )
+    analyze(Subscription, FavoriteRecipe, ShoppingCart)
+    ShoppingListItem.objects.refresh((user,))
+    for author in authors:
+        backfill_timeline(user.pk, author)
+    analyze(ShoppingListItem, TimelineEntry)
+
+
+def seed_popularity(generator):
+    """Задает случайную популярность рецептам без нее."""
+
+    recipes = Recipe.objects.filter(popularity__isnull=True).values_list(
+        'id', flat=True
+    ).order_by().iterator()
+    while chunk := list(islice(recipes, SEED_CHUNK_SIZE)):
+        RecipePopularity.objects.bulk_create(
+            RecipePopularity(recipe_id=recipe_id, score=generator.random())
+            for recipe_id in chunk
+        )
+    analyze(RecipePopularity)
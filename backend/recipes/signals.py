@@ -0,0 +1,253 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from recipes.cache import (CATALOG_VERSION_KEY, INGREDIENTS_VERSION_KEY,
+                           REFERENCE_VERSION_KEY, TAGS_VERSION_KEY,
+                           USER_VERSION_KEY, bump_version)
+from recipes.counters import COUNTERS, change_counter
+from recipes.images import delete_image_variants, needs_image_variants
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientRecipe,
+                            PopularityRemoval, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag, TagsRecipe, TimelineEntry)
+from recipes.popularity import POPULARITY_WEIGHTS
+from recipes.tasks import (BACKFILL_TIMELINE_JOB, FAN_OUT_JOB,
+                           IMAGE_VARIANTS_JOB)
+from users.models import Subscription, User
+
+CATALOG_MODELS = (Recipe, IngredientRecipe, TagsRecipe, Tag, Ingredient)
+REFERENCE_MODELS = (Tag, Ingredient)
+USER_PUBLIC_FIELDS = ('username', 'first_name', 'last_name', 'email')
+USER_STATE_MODELS = (FavoriteRecipe, ShoppingCart, Subscription)
+SHOPPING_LIST_MODELS = (ShoppingCart, IngredientRecipe)
+RECIPE_LINK_MODELS = (IngredientRecipe, TagsRecipe)
+RECIPE_LINK_ACTIONS = ('post_add', 'post_remove', 'pre_clear')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    """Сбрасывает копии ингредиентов после изменения в админке."""
+
+    transaction.on_commit(lambda: bump_version(INGREDIENTS_VERSION_KEY))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, created, **kwargs):
+    """Ставит в очередь создание копий картинки и рассылку по лентам."""
+
+    if needs_image_variants(instance):
+        enqueue(IMAGE_VARIANTS_JOB, {'recipe_id': instance.pk})
+    if created:
+        enqueue(FAN_OUT_JOB, {'recipe_id': instance.pk})
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(instance, created, **kwargs):
+    """Ставит в очередь заполнение ленты нового подписчика."""
+
+    if created:
+        enqueue(BACKFILL_TIMELINE_JOB, {
+            'user_id': instance.user_id, 'author_id': instance.author_id
+        })
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(instance, **kwargs):
+    """Убирает рецепты автора из ленты отписавшегося пользователя."""
+
+    TimelineEntry.objects.filter(
+        user_id=instance.user_id, recipe__author_id=instance.author_id
+    ).delete()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    """Удаляет копии картинки удаленного рецепта."""
+
+    variants = instance.image_variants
+    transaction.on_commit(lambda: delete_image_variants(variants))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(**kwargs):
+    """Сбрасывает копии тегов после изменения в админке."""
+
+    transaction.on_commit(lambda: bump_version(TAGS_VERSION_KEY))
+
+
+def recipe_link_changed(instance, **kwargs):
+    """Отмечает изменение рецепта после правки его тегов или ингредиентов.
+
+    Метки ответов и индекс ингредиентов опираются на updated_at, а
+    правки связей в админке не сохраняют сам рецепт.
+    """
+
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated_at=timezone.now()
+    )
+
+
+def recipe_links_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """Отмечает изменение рецептов после add, remove или clear связей.
+
+    При очистке со стороны тега или ингредиента рецепты находятся
+    по связям до их удаления.
+    """
+
+    if action not in RECIPE_LINK_ACTIONS:
+        return
+    if not reverse:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    elif pk_set is None:
+        recipes = Recipe.objects.filter(pk__in=sender.objects.filter(
+            **{instance._meta.model_name: instance}
+        ).values('recipe_id'))
+    else:
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    recipes.update(updated_at=timezone.now())
+
+
+def shopping_list_link_saving(sender, instance, **kwargs):
+    """Запоминает прежнюю версию связи перед ее изменением."""
+
+    instance.previous = None
+    if instance.pk:
+        instance.previous = sender.objects.filter(pk=instance.pk).first()
+
+
+def refresh_shopping_lists(link):
+    """Пересчитывает списки покупок, зависящие от связи."""
+
+    if isinstance(link, ShoppingCart):
+        ShoppingListItem.objects.refresh(
+            (link.user_id,),
+            IngredientRecipe.objects.filter(
+                recipe_id=link.recipe_id
+            ).values('ingredient_id')
+        )
+    else:
+        ShoppingListItem.objects.refresh(
+            User.objects.filter(shop_cart__recipe_id=link.recipe_id),
+            (link.ingredient_id,)
+        )
+
+
+def shopping_list_link_changed(instance, **kwargs):
+    """Пересчитывает списки покупок после изменения корзины или состава.
+
+    Срабатывает и для правок в админке, и при каскадном удалении
+    рецепта; при изменении связи пересчитывается и ее прежняя версия.
+    """
+
+    refresh_shopping_lists(instance)
+    previous = getattr(instance, 'previous', None)
+    if previous is not None:
+        refresh_shopping_lists(previous)
+
+
+def popularity_event_deleted(instance, **kwargs):
+    """Отмечает рецепт для пересчета популярности после удаления."""
+
+    PopularityRemoval.objects.create(recipe_id=instance.recipe_id)
+
+
+def counter_changed(sender, instance, signal, created=False, **kwargs):
+    """Меняет счетчик связанной записи при добавлении или удалении."""
+
+    if signal is post_save and not created:
+        return
+    for child, key, model, field in COUNTERS:
+        if child is sender:
+            change_counter(
+                model, getattr(instance, f'{key}_id'), field,
+                1 if created else -1
+            )
+
+
+def catalog_changed(**kwargs):
+    """Сбрасывает кеш ответов после изменения рецептов и их связей."""
+
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+
+
+def reference_changed(**kwargs):
+    """Сбрасывает метки ответов, зависящих от тегов, ингредиентов и авторов."""
+
+    transaction.on_commit(lambda: bump_version(REFERENCE_VERSION_KEY))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(instance, update_fields=None, **kwargs):
+    """Запоминает, меняются ли поля пользователя, видимые в ответах."""
+
+    if update_fields is not None:
+        instance.public_changed = bool(
+            set(update_fields) & set(USER_PUBLIC_FIELDS)
+        )
+        return
+    previous = None
+    if instance.pk:
+        previous = User.objects.filter(pk=instance.pk).values(
+            *USER_PUBLIC_FIELDS
+        ).first()
+    instance.public_changed = previous != {
+        field: getattr(instance, field) for field in USER_PUBLIC_FIELDS
+    }
+
+
+@receiver(post_save, sender=User)
+def user_saved(instance, created, **kwargs):
+    """Сбрасывает кеш ответов только после изменения публичных полей.
+
+    Вход пользователя обновляет last_login и кеш не затрагивает.
+    """
+
+    if created or getattr(instance, 'public_changed', True):
+        catalog_changed()
+        reference_changed()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(**kwargs):
+    """Сбрасывает кеш ответов после удаления пользователя."""
+
+    catalog_changed()
+    reference_changed()
+
+
+def user_state_changed(instance, **kwargs):
+    """Сбрасывает метки ответов пользователя после изменения его списков."""
+
+    key = USER_VERSION_KEY.format(instance.user_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_changed, sender=model)
+    post_delete.connect(catalog_changed, sender=model)
+m2m_changed.connect(catalog_changed, sender=Recipe.tags.through)
+m2m_changed.connect(catalog_changed, sender=Recipe.ingredient.through)
+for model in REFERENCE_MODELS:
+    post_save.connect(reference_changed, sender=model)
+    post_delete.connect(reference_changed, sender=model)
+for model in USER_STATE_MODELS:
+    post_save.connect(user_state_changed, sender=model)
+    post_delete.connect(user_state_changed, sender=model)
+for model in RECIPE_LINK_MODELS:
+    post_save.connect(recipe_link_changed, sender=model)
+    post_delete.connect(recipe_link_changed, sender=model)
+m2m_changed.connect(recipe_links_changed, sender=Recipe.tags.through)
+m2m_changed.connect(recipe_links_changed, sender=Recipe.ingredient.through)
+for model in SHOPPING_LIST_MODELS:
+    pre_save.connect(shopping_list_link_saving, sender=model)
+    post_save.connect(shopping_list_link_changed, sender=model)
+    post_delete.connect(shopping_list_link_changed, sender=model)
+for model, _ in POPULARITY_WEIGHTS:
+    post_delete.connect(popularity_event_deleted, sender=model)
+for child, *_ in COUNTERS:
+    post_save.connect(counter_changed, sender=child)
+    post_delete.connect(counter_changed, sender=child)
@@ -0,0 +1,55 @@
+from drf_extra_fields.fields import Base64ImageField
+
+from jobs.queue import job
+from recipes.images import is_same_image, refresh_image_variants
+from recipes.models import Recipe
+from recipes.timeline import backfill_timeline, fan_out_recipe
+from users.models import User
+
+STORE_IMAGE_JOB = 'recipes.store_image'
+IMAGE_VARIANTS_JOB = 'recipes.make_image_variants'
+FAN_OUT_JOB = 'recipes.fan_out_recipe'
+BACKFILL_TIMELINE_JOB = 'recipes.backfill_timeline'
+
+
+@job(STORE_IMAGE_JOB)
+def store_image(recipe_id, image):
+    """Декодирует картинку рецепта из base64 и сохраняет ее."""
+
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:
+        return
+    file = Base64ImageField().to_internal_value(image)
+    if is_same_image(recipe.image, file):
+        return
+    recipe.image.save(file.name, file, save=False)
+    recipe.save(update_fields=('image', 'updated_at'))
+
+
+@job(IMAGE_VARIANTS_JOB)
+def make_image_variants(recipe_id):
+    """Создает уменьшенные копии картинки рецепта."""
+
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is not None:
+        refresh_image_variants(recipe)
+
+
+@job(FAN_OUT_JOB)
+def fan_out(recipe_id):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+
+    recipe = Recipe.objects.select_related('author').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is not None:
+        fan_out_recipe(recipe)
+
+
+@job(BACKFILL_TIMELINE_JOB)
+def backfill(user_id, author_id):
+    """Заполняет ленту нового подписчика рецептами автора."""
+
+    author = User.objects.filter(pk=author_id).first()
+    if author is not None:
+        backfill_timeline(user_id, author)
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from recipes.images import PLACEHOLDER_IMAGE
+from recipes.models import FavoriteRecipe, Recipe, RecipePopularity
+from recipes.popularity import refresh_popularity
+from users.models import User
+
+EVENT_AGE = timedelta(hours=1)
+
+
+class RefreshPopularityTest(TestCase):
+    """Пересчет популярности по добавлениям и удалениям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}', password='password'
+            ) for number in range(2)
+        ]
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.users[0], name=f'Рецепт {number}',
+                description='Описание', cooking_time=10,
+                image=PLACEHOLDER_IMAGE
+            ) for number in range(2)
+        )
+
+    def favorite(self, user, recipe, created=None):
+        favorite = FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        FavoriteRecipe.objects.filter(pk=favorite.pk).update(
+            created=created or timezone.now() - EVENT_AGE
+        )
+
+    def get_scores(self):
+        return dict(RecipePopularity.objects.values_list('recipe', 'score'))
+
+    def test_removal_lowers_score(self):
+        for user in self.users:
+            self.favorite(user, self.recipes[0])
+        refresh_popularity()
+        score = self.get_scores()[self.recipes[0].pk]
+        FavoriteRecipe.objects.filter(user=self.users[1]).delete()
+        refresh_popularity()
+        self.assertLess(self.get_scores()[self.recipes[0].pk], score)
+        FavoriteRecipe.objects.all().delete()
+        refresh_popularity()
+        self.assertEqual(self.get_scores(), {})
+
+    def test_toggling_does_not_inflate_score(self):
+        self.favorite(self.users[0], self.recipes[0])
+        self.favorite(self.users[0], self.recipes[1])
+        refresh_popularity()
+        later = timezone.now() + EVENT_AGE
+        FavoriteRecipe.objects.filter(recipe=self.recipes[0]).delete()
+        self.favorite(self.users[0], self.recipes[0], later - EVENT_AGE / 2)
+        with mock.patch(
+            'recipes.popularity.timezone.now', return_value=later
+        ):
+            refresh_popularity()
+            incremental = self.get_scores()
+            refresh_popularity(full=True)
+        self.assertEqual(incremental.keys(), self.get_scores().keys())
+        for recipe_id, score in self.get_scores().items():
+            self.assertAlmostEqual(incremental[recipe_id], score)
@@ -0,0 +1,101 @@
+import heapq
+from itertools import islice
+
+from django.db.models import Q
+
+from recipes.models import Recipe, TimelineEntry
+from users.models import Subscription, User
+
+FANOUT_FOLLOWERS_LIMIT = 10_000
+FANOUT_BATCH_SIZE = 1000
+
+
+def is_fanned_out(author):
+    """Рецепты автора раскладываются по лентам при публикации.
+
+    Для авторов с огромным числом подписчиков это слишком дорого,
+    их рецепты добавляются в ленту при чтении.
+    """
+
+    return author.followers_count <= FANOUT_FOLLOWERS_LIMIT
+
+
+def fan_out_recipe(recipe):
+    """Добавляет рецепт в ленты всех подписчиков автора."""
+
+    if not is_fanned_out(recipe.author):
+        return
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True).order_by().iterator(
+        FANOUT_BATCH_SIZE
+    )
+    while True:
+        batch = list(islice(followers, FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(
+                user_id=user_id, recipe=recipe, pub_date=recipe.pub_date
+            ) for user_id in batch),
+            ignore_conflicts=True
+        )
+
+
+def backfill_timeline(user_id, author):
+    """Добавляет в ленту нового подписчика уже опубликованные рецепты."""
+
+    if not is_fanned_out(author) or not Subscription.objects.filter(
+        user_id=user_id, author=author
+    ).exists():
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(
+            user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+        ) for recipe_id, pub_date in Recipe.objects.filter(
+            author=author
+        ).values_list('id', 'pub_date').order_by().iterator()),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def before(position, date_field, id_field):
+    """Условие «строго после позиции» для ленты по убыванию даты и id."""
+
+    pub_date, recipe_id = position
+    return Q(**{f'{date_field}__lt': pub_date}) | Q(
+        **{date_field: pub_date, f'{id_field}__lt': recipe_id}
+    )
+
+
+def read_timeline(user, position, size):
+    """Возвращает до size записей ленты (pub_date, id) после позиции.
+
+    Записи из таблицы ленты сливаются с последними рецептами
+    авторов, чьи публикации не раскладывались по лентам.
+    """
+
+    entries = TimelineEntry.objects.filter(user=user)
+    pulled = Recipe.objects.filter(author__in=User.objects.filter(
+        following__user=user, followers_count__gt=FANOUT_FOLLOWERS_LIMIT
+    ))
+    if position is not None:
+        entries = entries.filter(before(position, 'pub_date', 'recipe_id'))
+        pulled = pulled.filter(before(position, 'pub_date', 'id'))
+    merged = heapq.merge(
+        entries.order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:size],
+        pulled.order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:size],
+        reverse=True
+    )
+    page = []
+    for entry in merged:
+        if not page or page[-1] != entry:
+            page.append(entry)
+        if len(page) == size:
+            break
+    return page
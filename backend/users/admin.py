@@ -5,13 +5,16 @@ from users.models import Subscription, User
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'email', 'username', 'first_name', 'last_name')
-    search_fields = ('username',)
-    list_filter = ('email', 'first_name')
+    list_display = (
+        'id', 'email', 'username', 'first_name', 'last_name',
+        'recipes_count', 'followers_count'
+    )
+    search_fields = ('username', 'email')
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
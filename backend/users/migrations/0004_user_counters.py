@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:20
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_related(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    User.objects.update(
+        recipes_count=Coalesce(models.Subquery(
+            Recipe.objects.filter(author=models.OuterRef('pk')).values(
+                'author'
+            ).annotate(total=models.Count('id')).values('total')
+        ), 0),
+        followers_count=Coalesce(models.Subquery(
+            Subscription.objects.filter(author=models.OuterRef('pk')).values(
+                'author'
+            ).annotate(total=models.Count('id')).values('total')
+        ), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_rename_subscribtion_subscription'),
+        ('recipes', '0013_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='subscription',
+            options={'ordering': ('-author_id',), 'verbose_name': 'Подписка', 'verbose_name_plural': 'Подписки'},
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.RunPython(count_related, migrations.RunPython.noop),
+    ]